@@ -0,0 +1,935 @@
+import json
+import os
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from catalogue import CatalogueMappe, LivresCatalogue, ecrire_catalogue
+from fil import FilChangements
+from integrite import ControleIntegrite, verifier_tout
+from reservations import Reservations, reservations_depuis_dict
+
+# ===================================================
+# CLASSES MÉTIER
+# ===================================================
+
+class Livre:
+    def __init__(self, titre, auteur, isbn):
+        self.titre = titre
+        self.auteur = auteur
+        self.isbn = isbn
+        self.disponible = True
+        self.emprunteur = None
+        self.date_emprunt = None
+        self.date_retour_prevue = None
+        self.nombre_emprunts = 0
+        # Chemin de l'image de couverture, facultatif
+        self.couverture = None
+        # Suivi des modifications : seul un enregistrement modifié est re-sérialisé
+        self.modifie = True
+        self._json = None
+
+    def marquer_modifie(self):
+        self.modifie = True
+
+    def to_dict(self):
+        d = {
+            "titre": self.titre,
+            "auteur": self.auteur,
+            "isbn": self.isbn,
+            "disponible": self.disponible,
+            "emprunteur": self.emprunteur,
+            "date_emprunt": self.date_emprunt.isoformat() if self.date_emprunt else None,
+            "date_retour_prevue": self.date_retour_prevue.isoformat() if self.date_retour_prevue else None,
+            "nombre_emprunts": self.nombre_emprunts
+        }
+        # Clé absente pour un livre sans couverture : les fichiers existants ne changent pas
+        if self.couverture:
+            d["couverture"] = self.couverture
+        return d
+
+class Utilisateur:
+    def __init__(self, nom, id_utilisateur, email=None):
+        self.nom = nom
+        self.id_utilisateur = id_utilisateur
+        self.email = email
+        self.livres_empruntes = []
+        # Un emprunt est noté [isbn, date d'emprunt] : deux antennes fusionnent leurs historiques
+        # sans perdre d'emprunt (les fichiers anciens contiennent des isbn seuls)
+        self.historique_emprunts = []
+        self.penalites = 0.0
+        # Pénalités de retard [isbn, date d'emprunt, montant], comptées une fois par emprunt
+        self.retards = []
+        self.modifie = True
+        self._json = None
+
+    def marquer_modifie(self):
+        self.modifie = True
+
+    def to_dict(self):
+        d = {
+            "nom": self.nom,
+            "id_utilisateur": self.id_utilisateur,
+        }
+        # Clé absente pour un utilisateur sans email : les fichiers existants ne changent pas
+        if self.email:
+            d["email"] = self.email
+        d.update({
+            "livres_empruntes": self.livres_empruntes,
+            "historique_emprunts": self.historique_emprunts,
+            "penalites": self.penalites
+        })
+        if self.retards:
+            d["retards"] = self.retards
+        return d
+
+def livre_depuis_dict(d):
+    livre = Livre(d["titre"], d["auteur"], d["isbn"])
+    livre.disponible = d["disponible"]
+    livre.emprunteur = d["emprunteur"]
+    livre.date_emprunt = datetime.fromisoformat(d["date_emprunt"]) if d["date_emprunt"] else None
+    livre.date_retour_prevue = datetime.fromisoformat(d["date_retour_prevue"]) if d["date_retour_prevue"] else None
+    livre.nombre_emprunts = d["nombre_emprunts"]
+    livre.couverture = d.get("couverture")
+    return livre
+
+def utilisateur_depuis_dict(u):
+    user = Utilisateur(u["nom"], u["id_utilisateur"], u.get("email"))
+    # Copies : un état reçu d'une bibliothèque en mémoire partage les listes de l'original
+    user.livres_empruntes = list(u["livres_empruntes"])
+    user.historique_emprunts = [list(e) if isinstance(e, list) else e for e in u["historique_emprunts"]]
+    user.penalites = u["penalites"]
+    user.retards = [list(r) for r in u.get("retards", ())]
+    return user
+
+def ecrire_atomique(fichier, contenu):
+    """Écrit un fichier sans jamais laisser de version partielle sur le disque"""
+    dossier = os.path.dirname(os.path.abspath(fichier))
+    temporaire = f"{fichier}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        f.write(contenu)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaire, fichier)
+    # Rendre le renommage durable (non supporté sous Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(dossier, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def _fragment_json(enregistrement):
+    """Retourne le JSON d'un livre ou d'un utilisateur, recalculé seulement s'il a changé"""
+    if enregistrement is None:
+        # Livre du catalogue supprimé
+        return "null"
+    if enregistrement.modifie or enregistrement._json is None:
+        # Indentation de niveau 2, identique à json.dump(..., indent=4) sur le fichier complet
+        enregistrement._json = json.dumps(enregistrement.to_dict(), indent=4).replace("\n", "\n        ")
+        enregistrement.modifie = False
+    return enregistrement._json
+
+def _section_json(enregistrements):
+    if not enregistrements:
+        return "{}"
+    lignes = [f"        {json.dumps(cle)}: {_fragment_json(e)}" for cle, e in enregistrements.items()]
+    return "{\n" + ",\n".join(lignes) + "\n    }"
+
+class _Apres:
+    """Valeur plus grande que toute autre : borne une clé par la droite, et sert de clé
+    aux livres sans date de retour pour qu'ils soient triés après les autres"""
+
+    def __lt__(self, autre):
+        return False
+
+    def __gt__(self, autre):
+        return True
+
+_APRES = _Apres()
+
+class IndexTrie:
+    """Index secondaire trié par (clé, isbn), maintenu à chaque modification d'un livre"""
+
+    def __init__(self, extraire):
+        self.extraire = extraire
+        self.cles = {}
+        self.tous = []
+        self.disponibles = []
+        self.a_reconstruire = None
+
+    def reconstruire(self, livres):
+        """Reporte la reconstruction au premier usage de l'index : le chargement ne parcourt pas le catalogue"""
+        self.a_reconstruire = livres
+
+    def _construire(self):
+        livres, self.a_reconstruire = self.a_reconstruire, None
+        self.cles = {}
+        # Avec un catalogue, le parcours donne des Notice : rien n'est matérialisé
+        for isbn, livre in livres.items():
+            cle = self.extraire(livre)
+            if cle is not None:
+                self.cles[isbn] = ((cle, isbn), livre.disponible)
+        self.tous = sorted(entree for entree, _ in self.cles.values())
+        self.disponibles = sorted(entree for entree, dispo in self.cles.values() if dispo)
+
+    def ajouter(self, isbn, livre):
+        if self.a_reconstruire is not None:
+            return
+        cle = self.extraire(livre)
+        if cle is None:
+            return
+        entree = (cle, isbn)
+        self.cles[isbn] = (entree, livre.disponible)
+        insort(self.tous, entree)
+        if livre.disponible:
+            insort(self.disponibles, entree)
+
+    def retirer(self, isbn):
+        if self.a_reconstruire is not None or isbn not in self.cles:
+            return
+        entree, disponible = self.cles.pop(isbn)
+        del self.tous[bisect_left(self.tous, entree)]
+        if disponible:
+            del self.disponibles[bisect_left(self.disponibles, entree)]
+
+    def _bornes(self, debut, fin, disponibles, inclure_debut=True, inclure_fin=False):
+        if self.a_reconstruire is not None:
+            self._construire()
+        entrees = self.disponibles if disponibles else self.tous
+        # (cle,) précède toutes les entrées de cette clé, (cle, _APRES) les suit toutes
+        if debut is None:
+            bas = 0
+        else:
+            bas = bisect_left(entrees, (debut,) if inclure_debut else (debut, _APRES))
+        if fin is None:
+            haut = len(entrees)
+        else:
+            haut = bisect_left(entrees, (fin, _APRES) if inclure_fin else (fin,))
+        return entrees, bas, max(bas, haut)
+
+    def compter(self, debut=None, fin=None, disponibles=False, inclure_debut=True, inclure_fin=False):
+        """Nombre de livres dont la clé est entre debut et fin (par défaut [debut, fin))"""
+        _, bas, haut = self._bornes(debut, fin, disponibles, inclure_debut, inclure_fin)
+        return haut - bas
+
+    def parcourir(self, debut=None, fin=None, disponibles=False, decroissant=False, decalage=0, limite=None,
+                  inclure_debut=True, inclure_fin=False):
+        """ISBN des livres dont la clé est entre debut et fin, dans l'ordre de l'index"""
+        entrees, bas, haut = self._bornes(debut, fin, disponibles, inclure_debut, inclure_fin)
+        if decroissant:
+            positions = range(haut - 1 - decalage, bas - 1, -1)
+        else:
+            positions = range(bas + decalage, haut)
+        if limite is not None:
+            positions = positions[:limite]
+        return [entrees[i][1] for i in positions]
+
+# ===================================================
+# REQUÊTES COMPOSÉES
+# ===================================================
+
+CHAMPS_REQUETE = {
+    "titre": ("=", "commence", "contient"),
+    "auteur": ("=", "commence", "contient"),
+    "isbn": ("=",),
+    "disponible": ("=",),
+    "emprunteur": ("=",),
+    "nombre_emprunts": ("=", "<", "<=", ">", ">=", "entre"),
+    "date_retour_prevue": ("=", "<", "<=", ">", ">=", "entre"),
+}
+
+def _normaliser(texte):
+    return texte.strip().casefold()
+
+class Critere:
+    """Condition simple sur un champ d'un livre, combinable avec & et |"""
+
+    def __init__(self, champ, operateur, valeur):
+        if champ not in CHAMPS_REQUETE:
+            raise ValueError(f"Champ inconnu: {champ}")
+        if operateur not in CHAMPS_REQUETE[champ]:
+            raise ValueError(f"Opérateur '{operateur}' non supporté pour {champ}")
+        self.champ = champ
+        self.operateur = operateur
+        self.valeur = valeur
+
+    def __and__(self, autre):
+        return Et(self, autre)
+
+    def __or__(self, autre):
+        return Ou(self, autre)
+
+    def __str__(self):
+        return f"{self.champ} {self.operateur} {self.valeur!r}"
+
+    def correspond(self, isbn, livre):
+        if self.champ == "isbn":
+            return isbn == self.valeur
+        valeur_livre = getattr(livre, self.champ)
+        if self.champ in ("titre", "auteur"):
+            if self.operateur == "contient":
+                return self.valeur.casefold() in valeur_livre.casefold()
+            if self.operateur == "commence":
+                return _normaliser(valeur_livre).startswith(_normaliser(self.valeur))
+            return _normaliser(valeur_livre) == _normaliser(self.valeur)
+        if valeur_livre is None:
+            return False
+        if self.operateur == "=":
+            return valeur_livre == self.valeur
+        if self.operateur == "<":
+            return valeur_livre < self.valeur
+        if self.operateur == "<=":
+            return valeur_livre <= self.valeur
+        if self.operateur == ">":
+            return valeur_livre > self.valeur
+        if self.operateur == ">=":
+            return valeur_livre >= self.valeur
+        debut, fin = self.valeur
+        return debut <= valeur_livre <= fin
+
+    def bornes(self):
+        """Intervalle (debut, fin, inclure_debut, inclure_fin) dans l'index du champ, ou None"""
+        if self.champ in ("titre", "auteur"):
+            if self.operateur == "contient":
+                return None
+            valeur = _normaliser(self.valeur)
+            if self.operateur == "commence":
+                return (valeur, valeur + "\U0010ffff", True, False)
+            return (valeur, valeur, True, True)
+        if self.champ not in ("nombre_emprunts", "date_retour_prevue"):
+            return None
+        if self.operateur == "=":
+            return (self.valeur, self.valeur, True, True)
+        if self.operateur == "<":
+            return (None, self.valeur, True, False)
+        if self.operateur == "<=":
+            return (None, self.valeur, True, True)
+        # Les livres sans date de retour sont rangés sous _APRES, hors de tout intervalle de dates
+        fin = _APRES if self.champ == "date_retour_prevue" else None
+        if self.operateur == ">":
+            return (self.valeur, fin, False, False)
+        if self.operateur == ">=":
+            return (self.valeur, fin, True, False)
+        return (self.valeur[0], self.valeur[1], True, True)
+
+class Et:
+    def __init__(self, *criteres):
+        self.criteres = criteres
+
+    def __and__(self, autre):
+        return Et(*self.criteres, autre)
+
+    def __or__(self, autre):
+        return Ou(self, autre)
+
+    def __str__(self):
+        return "(" + " ET ".join(str(c) for c in self.criteres) + ")"
+
+    def correspond(self, isbn, livre):
+        return all(c.correspond(isbn, livre) for c in self.criteres)
+
+class Ou:
+    def __init__(self, *criteres):
+        self.criteres = criteres
+
+    def __and__(self, autre):
+        return Et(self, autre)
+
+    def __or__(self, autre):
+        return Ou(*self.criteres, autre)
+
+    def __str__(self):
+        return "(" + " OU ".join(str(c) for c in self.criteres) + ")"
+
+    def correspond(self, isbn, livre):
+        return any(c.correspond(isbn, livre) for c in self.criteres)
+
+class Plan:
+    """Chemin d'accès choisi : une estimation du nombre de candidats et leur source"""
+
+    def __init__(self, description, cout, candidats, enfants=(), parcours=None):
+        self.description = description
+        self.cout = cout
+        self.candidats = candidats
+        self.enfants = enfants
+        # parcours() : (isbn, livre) dans l'ordre du stockage, sans recherche par clé
+        self.parcours = parcours
+
+    def lignes(self, niveau=0):
+        yield "  " * niveau + f"{self.description} (~{self.cout} livres)"
+        for enfant in self.enfants:
+            yield from enfant.lignes(niveau + 1)
+
+class Planificateur:
+    """Choisit l'index le plus sélectif pour une requête, et ne parcourt tout le catalogue qu'en dernier recours"""
+
+    def __init__(self, biblio):
+        self.biblio = biblio
+
+    def parcours_complet(self):
+        livres = self.biblio.livres
+        return Plan("Parcours complet", len(livres), lambda: list(livres), parcours=livres.items)
+
+    def planifier(self, critere, disponibles=False):
+        if isinstance(critere, Et):
+            return self._planifier_et(critere, disponibles)
+        if isinstance(critere, Ou):
+            return self._planifier_ou(critere, disponibles)
+        return self._planifier_critere(critere, disponibles) or self.parcours_complet()
+
+    def _planifier_critere(self, critere, disponibles):
+        biblio = self.biblio
+        if critere.champ == "isbn":
+            isbns = [critere.valeur] if critere.valeur in biblio.livres else []
+            return Plan(f"Accès direct isbn = {critere.valeur!r}", len(isbns), lambda: isbns)
+
+        if critere.champ == "emprunteur":
+            user = biblio.utilisateurs.get(critere.valeur)
+            isbns = list(user.livres_empruntes) if user else []
+            return Plan(f"Emprunts de l'utilisateur {critere.valeur!r}", len(isbns), lambda: isbns)
+
+        if critere.champ == "disponible":
+            if critere.valeur is not True:
+                return None
+            index = biblio.index["titre"]
+            return Plan("Index des livres disponibles", index.compter(disponibles=True),
+                        lambda: index.parcourir(disponibles=True))
+
+        bornes = critere.bornes()
+        if bornes is None:
+            return None
+        index = biblio.index[critere.champ]
+        debut, fin, inclure_debut, inclure_fin = bornes
+        cout = index.compter(debut, fin, disponibles, inclure_debut, inclure_fin)
+        description = f"Index {critere.champ} : {critere}"
+        if disponibles:
+            description += " (disponibles seulement)"
+        return Plan(description, cout,
+                    lambda: index.parcourir(debut, fin, disponibles,
+                                            inclure_debut=inclure_debut, inclure_fin=inclure_fin))
+
+    def _planifier_et(self, critere, disponibles):
+        # Une condition « disponible = True » restreint les intervalles d'index aux livres disponibles
+        disponibles = disponibles or any(
+            isinstance(c, Critere) and c.champ == "disponible" and c.valeur is True
+            for c in critere.criteres)
+        plans = []
+        for enfant in critere.criteres:
+            if isinstance(enfant, Critere):
+                plan = self._planifier_critere(enfant, disponibles)
+            else:
+                plan = self.planifier(enfant, disponibles)
+            if plan is not None:
+                plans.append(plan)
+        if not plans:
+            return self.parcours_complet()
+        return min(plans, key=lambda plan: plan.cout)
+
+    def _planifier_ou(self, critere, disponibles):
+        plans = [self.planifier(enfant, disponibles) for enfant in critere.criteres]
+        cout = sum(plan.cout for plan in plans)
+        if cout >= len(self.biblio.livres):
+            return self.parcours_complet()
+
+        def candidats():
+            vus = {}
+            for plan in plans:
+                for isbn in plan.candidats():
+                    vus[isbn] = None
+            return list(vus)
+
+        return Plan("Union", cout, candidats, plans)
+
+class Bibliotheque:
+    def __init__(self):
+        self.livres = {}
+        self.utilisateurs = {}
+        self.duree_emprunt = 14
+        self.taux_penalite = 0.5
+        # Fichier catalogue (titre, auteur, isbn) projeté en mémoire, relatif au fichier de données
+        self.catalogue = None
+        # Fil des changements : (type, cle) -> numéro du dernier changement, journalisé par sauvegarder
+        self.sequence = 0
+        self.fil = FilChangements()
+        # Dernier numéro reçu de chaque bibliothèque distante
+        self.curseurs = {}
+        # Files d'attente des livres empruntés, propres à chaque antenne (non répliquées)
+        self.reservations = Reservations()
+        self.observateurs = []
+        self.index = {
+            "titre": IndexTrie(lambda l: l.titre.strip().casefold()),
+            "auteur": IndexTrie(lambda l: l.auteur.strip().casefold()),
+            "nombre_emprunts": IndexTrie(lambda l: l.nombre_emprunts),
+            "date_retour_prevue": IndexTrie(lambda l: l.date_retour_prevue or _APRES),
+        }
+        self.abonner(self._maj_index)
+        # Compteurs des statistiques, tenus à jour par les notifications
+        self.empruntes = set()
+        self.penalites = {}
+        self.penalites_total = 0.0
+        self.abonner(self._maj_compteurs)
+        # Un livre redevenu disponible est mis de côté pour sa file, quelle que soit l'origine du retour
+        self.abonner(self._servir_reservations)
+        # Cohérence des prêts : contrôle complet au chargement, puis des seuls enregistrements modifiés
+        self.rapport_integrite = []
+        # Anomalies trouvées par le contrôle incrémental de la dernière sauvegarde
+        self.rapport_sauvegarde = []
+        self.integrite = ControleIntegrite(self)
+        self.abonner(self.integrite.on_changement)
+
+    def _maj_index(self, evenement, isbn):
+        if evenement == "recharge":
+            for index in self.index.values():
+                index.reconstruire(self.livres)
+        elif evenement in ("livre_ajoute", "livre_modifie", "livre_supprime"):
+            for index in self.index.values():
+                index.retirer(isbn)
+                if evenement != "livre_supprime":
+                    index.ajouter(isbn, self.livres[isbn])
+
+    def _maj_compteurs(self, evenement, cle):
+        if evenement == "recharge":
+            # Avec un catalogue, seule la surcouche peut contenir des livres empruntés
+            livres = self.livres.materialises if isinstance(self.livres, LivresCatalogue) else self.livres
+            self.empruntes = {isbn for isbn, livre in livres.items() if not livre.disponible}
+            self.penalites = {id_user: user.penalites for id_user, user in self.utilisateurs.items()}
+            self.penalites_total = sum(self.penalites.values())
+        elif evenement in ("livre_ajoute", "livre_modifie"):
+            if self.livres[cle].disponible:
+                self.empruntes.discard(cle)
+            else:
+                self.empruntes.add(cle)
+        elif evenement == "livre_supprime":
+            self.empruntes.discard(cle)
+        elif evenement.startswith("utilisateur_"):
+            penalites = self.utilisateurs[cle].penalites
+            self.penalites_total += penalites - self.penalites.get(cle, 0.0)
+            self.penalites[cle] = penalites
+
+    def compteurs(self):
+        """Totaux de l'accueil, en temps constant"""
+        return {
+            "total_livres": len(self.livres),
+            "livres_disponibles": len(self.livres) - len(self.empruntes),
+            "livres_empruntes": len(self.empruntes),
+            "total_utilisateurs": len(self.utilisateurs),
+            "penalites_total": round(self.penalites_total, 2),
+        }
+
+    def abonner(self, rappel):
+        """Enregistre rappel(evenement, cle), appelé après chaque modification"""
+        self.observateurs.append(rappel)
+
+    def _notifier(self, evenement, cle=None):
+        if evenement != "recharge":
+            self._enregistrer_changement(evenement, cle)
+        for rappel in self.observateurs:
+            rappel(evenement, cle)
+
+    def _enregistrer_changement(self, evenement, cle):
+        # livre_ajoute -> livre, utilisateur_modifie -> utilisateur, parametres_modifies -> parametres
+        type_ = evenement.split("_")[0]
+        self.sequence += 1
+        self.fil.enregistrer(type_, cle, self.sequence)
+
+    def etat(self, type_, cle):
+        """État courant d'un enregistrement du fil des changements, None pour un livre supprimé"""
+        if type_ == "livre":
+            return self.livres[cle].to_dict() if cle in self.livres else None
+        if type_ == "utilisateur":
+            return self.utilisateurs[cle].to_dict()
+        return {"duree_emprunt": self.duree_emprunt, "taux_penalite": self.taux_penalite}
+
+    def changements_depuis(self, sequence=0):
+        """Retourne ([(numero, type, cle, etat)...], numero courant) des changements postérieurs à sequence.
+
+        Un enregistrement modifié plusieurs fois n'apparaît qu'une fois, avec son état actuel :
+        le coût est proportionnel au nombre d'enregistrements changés, pas à la taille du catalogue.
+        """
+        resultat = [(numero, type_, cle, self.etat(type_, cle))
+                    for numero, type_, cle in self.fil.depuis(sequence)]
+        return resultat, self.sequence
+
+    def appliquer_livre(self, isbn, livre):
+        """Remplace un livre par une version reçue d'une autre bibliothèque (None pour le supprimer)"""
+        if livre is None:
+            if isbn in self.livres:
+                del self.livres[isbn]
+                self.reservations.oublier_livre(isbn)
+                self._notifier("livre_supprime", isbn)
+            return
+        evenement = "livre_modifie" if isbn in self.livres else "livre_ajoute"
+        self.livres[isbn] = livre
+        self._notifier(evenement, isbn)
+
+    def appliquer_utilisateur(self, id_user, user):
+        evenement = "utilisateur_modifie" if id_user in self.utilisateurs else "utilisateur_ajoute"
+        user.marquer_modifie()
+        self.utilisateurs[id_user] = user
+        self._notifier(evenement, id_user)
+
+    def contenu_json(self):
+        """Texte complet du fichier de données, seuls les enregistrements modifiés sont ré-encodés"""
+        livres = self.livres.surcouche() if isinstance(self.livres, LivresCatalogue) else self.livres
+        catalogue = f'    "catalogue": {json.dumps(self.catalogue)},\n' if self.catalogue else ""
+        return (
+            "{\n"
+            f"{catalogue}"
+            f'    "livres": {_section_json(livres)},\n'
+            f'    "utilisateurs": {_section_json(self.utilisateurs)},\n'
+            f'    "duree_emprunt": {json.dumps(self.duree_emprunt)},\n'
+            f'    "taux_penalite": {json.dumps(self.taux_penalite)}'
+            f"{self._reservations_json()}"
+            f"{self._fil_json()}\n"
+            "}"
+        )
+
+    def _reservations_json(self):
+        # Section absente tant qu'aucune réservation n'a été faite
+        if not self.reservations.files and not self.reservations.mises_de_cote:
+            return ""
+        return f',\n    "reservations": {json.dumps(self.reservations.to_dict())}'
+
+    def _fil_json(self):
+        if not self.sequence and not self.curseurs:
+            return ""
+        # Le fil lui-même est dans son journal, relatif au fichier de données comme le catalogue
+        fil = ""
+        if self.fil.journal:
+            fil = (f'    "fil": {json.dumps(os.path.basename(self.fil.journal))},\n'
+                   f'    "taille_fil": {self.fil.taille},\n')
+        return (
+            ",\n"
+            f'    "sequence": {self.sequence},\n'
+            f"{fil}"
+            f'    "curseurs": {json.dumps(self.curseurs)}'
+        )
+
+    def sauvegarder(self, fichier="bibliotheque.json"):
+        """Contrôle les enregistrements modifiés puis écrit le fichier ; retourne les anomalies trouvées"""
+        self.rapport_sauvegarde, corriges = self.integrite.verifier_modifies()
+        for evenement, cle in corriges:
+            self._notifier(evenement, cle)
+        # Le journal du fil d'abord : le fichier de données retient sa taille
+        self.fil.ecrire(f"{os.path.splitext(fichier)[0]}.changements.jsonl")
+        ecrire_atomique(fichier, self.contenu_json())
+        return self.rapport_sauvegarde
+
+    def charger_donnees(self, fichier="bibliotheque.json"):
+        try:
+            with open(fichier, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self.sauvegarder(fichier)
+            return
+        self.importer(data, os.path.dirname(fichier))
+
+    def importer(self, data, dossier=""):
+        """Remplace le contenu de la bibliothèque par un dictionnaire au format du fichier de données.
+
+        Avec un catalogue, "livres" ne contient que la surcouche (None pour un livre supprimé).
+        """
+        self.catalogue = data.get("catalogue")
+        if self.catalogue:
+            self.livres = LivresCatalogue(CatalogueMappe(os.path.join(dossier, self.catalogue)), Livre)
+        else:
+            self.livres = {}
+        for isbn, d in data["livres"].items():
+            if d is None:
+                self.livres.pop(isbn, None)
+            else:
+                self.livres[isbn] = livre_depuis_dict(d)
+            
+        self.utilisateurs = {}
+        for id_user, u in data["utilisateurs"].items():
+            self.utilisateurs[id_user] = utilisateur_depuis_dict(u)
+            
+        self.duree_emprunt = data["duree_emprunt"]
+        self.taux_penalite = data["taux_penalite"]
+        self.sequence = data.get("sequence", 0)
+        if data.get("fil"):
+            self.fil = FilChangements(os.path.join(dossier, data["fil"]), data["taille_fil"])
+        else:
+            self.fil = FilChangements()
+        # Ancien format : le fil était dans le fichier de données, il passe au journal à la sauvegarde
+        for seq, type_, cle in data.get("changements", []):
+            self.fil.enregistrer(type_, cle, seq)
+        self.curseurs = data.get("curseurs", {})
+        self.reservations = reservations_depuis_dict(data["reservations"]) if "reservations" in data else Reservations()
+        # Les index et les écrans sont reconstruits par "recharge" : les corrections n'ont qu'à entrer dans le fil
+        self.rapport_integrite, corriges = verifier_tout(self)
+        for evenement, cle in sorted(corriges):
+            self._enregistrer_changement(evenement, cle)
+        self._notifier("recharge")
+
+    def exporter_catalogue(self, fichier="catalogue.bin", dossier=""):
+        """Fige titre, auteur et isbn dans un catalogue ; le fichier de données ne garde que l'état des prêts"""
+        chemin = os.path.join(dossier, fichier)
+        ecrire_catalogue(self.livres, chemin)
+        livres = LivresCatalogue(CatalogueMappe(chemin), Livre)
+        for isbn, livre in self.livres.items():
+            if not livre.disponible or livre.nombre_emprunts or livre.couverture:
+                livres[isbn] = livre
+        self.livres = livres
+        self.catalogue = fichier
+        self._notifier("recharge")
+
+    def modifier_parametres(self, duree_emprunt, taux_penalite):
+        self.duree_emprunt = duree_emprunt
+        self.taux_penalite = taux_penalite
+        self._notifier("parametres_modifies")
+
+    def ajouter_livre(self, livre):
+        if livre.isbn in self.livres:
+            return False
+        self.livres[livre.isbn] = livre
+        self._notifier("livre_ajoute", livre.isbn)
+        return True
+
+    def definir_couverture(self, isbn, chemin):
+        """Associe une image de couverture à un livre (None pour la retirer)"""
+        if isbn not in self.livres:
+            return False
+        livre = self.livres[isbn]
+        livre.couverture = chemin or None
+        livre.marquer_modifie()
+        self._notifier("livre_modifie", isbn)
+        return True
+
+    def ajouter_utilisateur(self, utilisateur):
+        if utilisateur.id_utilisateur in self.utilisateurs:
+            return False
+        self.utilisateurs[utilisateur.id_utilisateur] = utilisateur
+        self._notifier("utilisateur_ajoute", utilisateur.id_utilisateur)
+        return True
+
+    def emprunter_livre(self, isbn, id_user):
+        if isbn not in self.livres or id_user not in self.utilisateurs:
+            return False
+        
+        livre = self.livres[isbn]
+        user = self.utilisateurs[id_user]
+        
+        if not livre.disponible:
+            return False
+
+        # Un livre mis de côté ne peut être emprunté que par celui qui l'a réservé
+        self._expirer_reservations(datetime.now())
+        mise = self.reservations.mise_de_cote(isbn)
+        if mise is None and isbn in self.reservations.files:
+            # File d'attente sans mise de côté : le premier de la file passe avant tout autre emprunteur
+            self.reservations.servir(isbn, datetime.now())
+            mise = self.reservations.mise_de_cote(isbn)
+            self._notifier("livre_modifie", isbn)
+        if mise is not None:
+            if mise[0] != id_user:
+                return False
+            self.reservations.retirer(isbn, id_user)
+        
+        livre.disponible = False
+        livre.emprunteur = id_user
+        livre.date_emprunt = datetime.now()
+        livre.date_retour_prevue = livre.date_emprunt + timedelta(days=self.duree_emprunt)
+        livre.nombre_emprunts += 1
+        
+        user.livres_empruntes.append(isbn)
+        user.historique_emprunts.append([isbn, livre.date_emprunt.isoformat()])
+        livre.marquer_modifie()
+        user.marquer_modifie()
+        self._notifier("livre_modifie", isbn)
+        self._notifier("utilisateur_modifie", user.id_utilisateur)
+        return True
+
+    def retourner_livre(self, isbn):
+        if isbn not in self.livres or self.livres[isbn].disponible:
+            return False
+        
+        livre = self.livres[isbn]
+        # Emprunteur absent des utilisateurs (anomalie signalée au chargement) : le retour reste possible
+        user = self.utilisateurs.get(livre.emprunteur)
+        
+        if user and livre.date_retour_prevue and datetime.now() > livre.date_retour_prevue:
+            jours_retard = (datetime.now() - livre.date_retour_prevue).days
+            montant = round(jours_retard * self.taux_penalite, 2)
+            if montant:
+                user.penalites = round(user.penalites + montant, 2)
+                emprunt = livre.date_emprunt.isoformat() if livre.date_emprunt else None
+                user.retards.append([isbn, emprunt, montant])
+        
+        livre.disponible = True
+        livre.emprunteur = None
+        livre.date_emprunt = None
+        livre.date_retour_prevue = None
+        livre.marquer_modifie()
+        # La file d'attente est servie par _servir_reservations
+        self._notifier("livre_modifie", isbn)
+        if user:
+            if isbn in user.livres_empruntes:
+                user.livres_empruntes.remove(isbn)
+            user.marquer_modifie()
+            self._notifier("utilisateur_modifie", user.id_utilisateur)
+        return True
+
+    def _servir_reservations(self, evenement, isbn):
+        """Garde l'invariant : un livre disponible qui a une file d'attente est mis de côté pour le premier.
+
+        Le retour peut venir de retourner_livre, d'une autre antenne ou d'une correction du contrôle des prêts.
+        """
+        if evenement == "recharge":
+            isbns = list(self.reservations.files) + list(self.reservations.mises_de_cote)
+        elif evenement in ("livre_ajoute", "livre_modifie"):
+            isbns = [isbn]
+        else:
+            return
+        maintenant = datetime.now()
+        for isbn in isbns:
+            livre = self.livres.get(isbn)
+            if livre is None:
+                continue
+            mise = self.reservations.mise_de_cote(isbn)
+            if not livre.disponible:
+                # Prêté par une autre antenne pendant la mise de côté : au titulaire, la réservation
+                # est honorée ; à un autre, le titulaire attend le retour en tête de file
+                if mise is not None and livre.emprunteur == mise[0]:
+                    self.reservations.retirer(isbn, mise[0])
+                elif mise is not None:
+                    self.reservations.reporter(isbn, maintenant)
+            elif mise is None and isbn in self.reservations.files:
+                self._expirer_reservations(maintenant)
+                self.reservations.servir(isbn, maintenant)
+
+    def _expirer_reservations(self, maintenant):
+        for isbn in self.reservations.expirer(maintenant):
+            self._notifier("livre_modifie", isbn)
+
+    def reserver(self, isbn, id_user):
+        """Met l'utilisateur en file d'attente d'un livre emprunté ou mis de côté pour un autre"""
+        if isbn not in self.livres or id_user not in self.utilisateurs:
+            return False
+        maintenant = datetime.now()
+        self._expirer_reservations(maintenant)
+        livre = self._lire_livre(isbn)
+        mise = self.reservations.mise_de_cote(isbn)
+        if livre.emprunteur == id_user or (mise is not None and mise[0] == id_user):
+            return False
+        # Un livre en rayon s'emprunte directement
+        if livre.disponible and mise is None:
+            return False
+        return self.reservations.ajouter(isbn, id_user, maintenant)
+
+    def annuler_reservation(self, isbn, id_user):
+        mise = self.reservations.mise_de_cote(isbn)
+        if not self.reservations.annuler(isbn, id_user, datetime.now()):
+            return False
+        if self.reservations.mise_de_cote(isbn) != mise:
+            self._notifier("livre_modifie", isbn)
+        return True
+
+    def rechercher_livre(self, critere, valeur):
+        """Recherche des livres selon un critère et une valeur"""
+        if critere not in ("titre", "auteur", "isbn"):
+            raise ValueError(f"Critère de recherche inconnu: {critere}")
+        operateur = "=" if critere == "isbn" else "contient"
+        return self.requete(Critere(critere, operateur, valeur))
+
+    def requete(self, critere):
+        """Retourne les livres qui satisfont une combinaison de Critere, Et et Ou"""
+        plan = Planificateur(self).planifier(critere)
+        if plan.parcours is not None:
+            paires = plan.parcours()
+        else:
+            # Un emprunteur peut lister un livre supprimé : les candidats absents sont ignorés
+            paires = ((isbn, self._lire_livre(isbn)) for isbn in plan.candidats() if isbn in self.livres)
+        return [livre for isbn, livre in paires if critere.correspond(isbn, livre)]
+
+    def _lire_livre(self, isbn):
+        """Livre à afficher ou à filtrer : avec un catalogue, une notice jamais touchée n'est pas matérialisée"""
+        if isinstance(self.livres, LivresCatalogue):
+            return self.livres.lire(isbn)
+        return self.livres[isbn]
+
+    def expliquer(self, critere):
+        """Décrit le plan d'exécution choisi pour une requête"""
+        plan = Planificateur(self).planifier(critere)
+        return "\n".join([f"Filtre : {critere}", *plan.lignes()])
+
+    def livres_tries(self, critere="titre", page=0, taille=None, disponibles=False, decroissant=False, debut=None, fin=None):
+        """Retourne une page du catalogue triée selon un index, sans trier à chaque appel"""
+        decalage = page * taille if taille else 0
+        isbns = self.index[critere].parcourir(debut, fin, disponibles, decroissant, decalage, taille)
+        return [self._lire_livre(isbn) for isbn in isbns]
+
+    def compter_livres(self, critere="titre", disponibles=False, debut=None, fin=None):
+        return self.index[critere].compter(debut, fin, disponibles)
+
+    def afficher_livres_disponibles(self):
+        """Retourne la liste des livres disponibles, triés par titre"""
+        return self.livres_tries("titre", disponibles=True)
+
+    def verifier_retards(self):
+        """Identifie les livres qui sont en retard"""
+        return self.livres_tries("date_retour_prevue", fin=datetime.now())
+    def supprimer_livre(self, isbn):
+        if isbn in self.livres:
+            if not self.livres[isbn].disponible:
+                return f"Livre avec ISBN '{isbn}' emprunté : il doit être retourné avant d'être supprimé"
+            del self.livres[isbn]
+            self.reservations.oublier_livre(isbn)
+            self._notifier("livre_supprime", isbn)
+            return f"Livre avec ISBN '{isbn}' supprimé avec succès"
+        return "Livre non trouvé"
+
+    def get_statistiques(self):
+        stats = {
+            **self.compteurs(),
+            "livre_plus_emprunte": None,
+            "max_emprunts": 0,
+            "utilisateur_plus_actif": None,
+            "max_livres_empruntes": 0
+        }
+        
+        # Trouver le livre le plus emprunté ; avec un catalogue, une notice jamais touchée n'a aucun emprunt
+        livres = self.livres.materialises if isinstance(self.livres, LivresCatalogue) else self.livres
+        for livre in livres.values():
+            if livre.nombre_emprunts > stats["max_emprunts"]:
+                stats["max_emprunts"] = livre.nombre_emprunts
+                stats["livre_plus_emprunte"] = livre
+        
+        # Trouver l'utilisateur le plus actif
+        for user in self.utilisateurs.values():
+            if len(user.historique_emprunts) > stats["max_livres_empruntes"]:
+                stats["max_livres_empruntes"] = len(user.historique_emprunts)
+                stats["utilisateur_plus_actif"] = user
+        
+        return stats
+
+class PlanificateurSauvegarde:
+    """Regroupe les sauvegardes demandées pendant une fenêtre de latence en une seule écriture.
+
+    programmer(delai_ms, fonction) doit exécuter fonction dans le thread qui modifie la
+    bibliothèque (root.after dans l'interface) : sauvegarder parcourt et corrige les
+    enregistrements, ce qui ne doit pas se faire pendant une modification.
+    """
+
+    def __init__(self, biblio, programmer, fichier="bibliotheque.json", delai=2.0, rapporter=None):
+        self.biblio = biblio
+        self.programmer = programmer
+        # rapporter(anomalies) : appelé quand une écriture a trouvé des anomalies de prêt
+        self.rapporter = rapporter
+        self.fichier = fichier
+        self.delai = delai
+        self.en_attente = False
+
+    def signaler(self):
+        """Indique qu'une modification doit être écrite avant la fin de la fenêtre"""
+        if self.en_attente:
+            return
+        self.en_attente = True
+        self.programmer(int(self.delai * 1000), self.vider)
+
+    def vider(self):
+        """Écrit immédiatement les modifications en attente"""
+        self.en_attente = False
+        anomalies = self.biblio.sauvegarder(self.fichier)
+        if anomalies and self.rapporter is not None:
+            self.rapporter(anomalies)
@@ -0,0 +1,233 @@
+"""Catalogue bibliographique en lecture seule, projeté en mémoire (mmap).
+
+Seuls titre, auteur et isbn y sont stockés ; l'état des prêts reste dans le
+fichier de données sous forme de surcouche. Les pages du fichier sont
+partagées par le système entre tous les processus qui l'ouvrent, et un livre
+n'est décodé qu'au moment où on y accède.
+
+Format (entiers non signés 32 bits, petit-boutiste) :
+    en-tête      MAGIE, nombre de livres, position des enregistrements,
+                 de la table triée et du réservoir de chaînes
+    enregistrements  nombre × (décalage, longueur) pour cle, titre, auteur, isbn
+    table triée  nombre × rang, par ordre croissant de clé
+    réservoir    chaînes UTF-8 bout à bout
+"""
+import mmap
+import os
+import struct
+from collections.abc import MutableMapping
+
+MAGIE = b"BIBCAT01"
+ENTETE = struct.Struct("<8s4I")
+ENREGISTREMENT = struct.Struct("<8I")
+RANG = struct.Struct("<I")
+
+def ecrire_catalogue(livres, fichier):
+    """Écrit le catalogue de {cle: livre} dans fichier, de façon atomique"""
+    reservoir = bytearray()
+    enregistrements = bytearray()
+    cles = []
+    for cle, livre in livres.items():
+        champs = []
+        for texte in (cle, livre.titre, livre.auteur, livre.isbn):
+            octets = texte.encode("utf-8")
+            champs += [len(reservoir), len(octets)]
+            reservoir += octets
+        enregistrements += ENREGISTREMENT.pack(*champs)
+        cles.append(cle)
+
+    tri = b"".join(RANG.pack(rang) for rang in sorted(range(len(cles)), key=cles.__getitem__))
+    debut_enregistrements = ENTETE.size
+    debut_tri = debut_enregistrements + len(enregistrements)
+    debut_reservoir = debut_tri + len(tri)
+
+    temporaire = f"{fichier}.tmp"
+    with open(temporaire, "wb") as f:
+        f.write(ENTETE.pack(MAGIE, len(cles), debut_enregistrements, debut_tri, debut_reservoir))
+        f.write(enregistrements)
+        f.write(tri)
+        f.write(reservoir)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporaire, fichier)
+
+class CatalogueMappe:
+    """Accès aléatoire au catalogue sans le charger : O(log n) par recherche de clé"""
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+        with open(fichier, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magie, self.nombre, self.debut_enregistrements, self.debut_tri, self.debut_reservoir = \
+            ENTETE.unpack_from(self.mm, 0)
+        if magie != MAGIE:
+            self.mm.close()
+            raise ValueError(f"{fichier} n'est pas un catalogue valide")
+
+    def __len__(self):
+        return self.nombre
+
+    def _texte(self, decalage, longueur):
+        debut = self.debut_reservoir + decalage
+        return self.mm[debut:debut + longueur].decode("utf-8")
+
+    def cle(self, rang):
+        return self.champ(rang, 0)
+
+    def champ(self, rang, numero):
+        """Décode un seul champ (0 cle, 1 titre, 2 auteur, 3 isbn)"""
+        decalage, longueur = struct.unpack_from(
+            "<2I", self.mm, self.debut_enregistrements + rang * ENREGISTREMENT.size + numero * 8)
+        return self._texte(decalage, longueur)
+
+    def champs(self, rang):
+        """Retourne (cle, titre, auteur, isbn) du livre de ce rang"""
+        valeurs = ENREGISTREMENT.unpack_from(self.mm, self.debut_enregistrements + rang * ENREGISTREMENT.size)
+        return tuple(self._texte(valeurs[i], valeurs[i + 1]) for i in range(0, 8, 2))
+
+    def rang(self, cle):
+        """Rang du livre de cette clé, ou None, par dichotomie sur la table triée"""
+        bas, haut = 0, self.nombre
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            rang, = RANG.unpack_from(self.mm, self.debut_tri + milieu * RANG.size)
+            cle_milieu = self.cle(rang)
+            if cle_milieu == cle:
+                return rang
+            if cle_milieu < cle:
+                bas = milieu + 1
+            else:
+                haut = milieu
+        return None
+
+    def cles(self):
+        for rang in range(self.nombre):
+            yield self.cle(rang)
+
+    def fermer(self):
+        self.mm.close()
+
+class Notice:
+    """Livre jamais modifié, en lecture seule : l'état de prêt est celui d'un livre neuf"""
+
+    __slots__ = ("catalogue", "rang")
+
+    disponible = True
+    emprunteur = None
+    date_emprunt = None
+    date_retour_prevue = None
+    nombre_emprunts = 0
+    couverture = None
+
+    def __init__(self, catalogue, rang):
+        self.catalogue = catalogue
+        self.rang = rang
+
+    @property
+    def titre(self):
+        return self.catalogue.champ(self.rang, 1)
+
+    @property
+    def auteur(self):
+        return self.catalogue.champ(self.rang, 2)
+
+    @property
+    def isbn(self):
+        return self.catalogue.champ(self.rang, 3)
+
+class LivresCatalogue(MutableMapping):
+    """Dictionnaire {cle: Livre} adossé au catalogue, les livres sont créés au premier accès.
+
+    Les livres ajoutés, supprimés ou modifiés forment la surcouche, seule
+    partie réécrite dans le fichier de données.
+    """
+
+    def __init__(self, catalogue, fabrique):
+        self.catalogue = catalogue
+        self.fabrique = fabrique
+        self.materialises = {}
+        self.ajoutes = {}
+        self.supprimes = set()
+        self.surcharges = set()
+
+    def __getitem__(self, cle):
+        livre = self.materialises.get(cle)
+        if livre is not None:
+            return livre
+        if cle in self.supprimes:
+            raise KeyError(cle)
+        rang = self.catalogue.rang(cle)
+        if rang is None:
+            raise KeyError(cle)
+        _, titre, auteur, isbn = self.catalogue.champs(rang)
+        livre = self.fabrique(titre, auteur, isbn)
+        livre.modifie = False
+        self.materialises[cle] = livre
+        return livre
+
+    def lire(self, cle):
+        """Comme self[cle], mais un livre jamais touché est rendu en Notice sans être matérialisé"""
+        livre = self.materialises.get(cle)
+        if livre is not None:
+            return livre
+        rang = None if cle in self.supprimes else self.catalogue.rang(cle)
+        if rang is None:
+            raise KeyError(cle)
+        return Notice(self.catalogue, rang)
+
+    def __contains__(self, cle):
+        if cle in self.materialises:
+            return True
+        return cle not in self.supprimes and self.catalogue.rang(cle) is not None
+
+    def __setitem__(self, cle, livre):
+        if cle in self.supprimes:
+            self.supprimes.discard(cle)
+        elif cle not in self.materialises and self.catalogue.rang(cle) is None:
+            self.ajoutes[cle] = None
+        self.materialises[cle] = livre
+        self.surcharges.add(cle)
+
+    def __delitem__(self, cle):
+        if cle not in self:
+            raise KeyError(cle)
+        self.materialises.pop(cle, None)
+        if cle in self.ajoutes:
+            del self.ajoutes[cle]
+            self.surcharges.discard(cle)
+        else:
+            self.supprimes.add(cle)
+            self.surcharges.add(cle)
+
+    def __iter__(self):
+        for cle in self.catalogue.cles():
+            if cle not in self.supprimes:
+                yield cle
+        yield from list(self.ajoutes)
+
+    def __len__(self):
+        return len(self.catalogue) - len(self.supprimes) + len(self.ajoutes)
+
+    def items(self):
+        """Parcours séquentiel du catalogue, sans recherche dichotomique par clé.
+
+        Les livres jamais touchés sont des Notice en lecture seule : un parcours
+        ne matérialise rien, la surcouche reste limitée aux livres modifiés.
+        """
+        for rang in range(len(self.catalogue)):
+            cle = self.catalogue.cle(rang)
+            if cle not in self.supprimes:
+                yield cle, self.materialises.get(cle) or Notice(self.catalogue, rang)
+        for cle in list(self.ajoutes):
+            yield cle, self.materialises[cle]
+
+    def values(self):
+        for _, livre in self.items():
+            yield livre
+
+    def surcouche(self):
+        """{cle: Livre ou None si supprimé} des livres qui diffèrent du catalogue"""
+        for cle, livre in self.materialises.items():
+            if livre.modifie:
+                self.surcharges.add(cle)
+        return {cle: self.materialises.get(cle) for cle in self.surcharges}
@@ -0,0 +1,249 @@
+"""Traitements en ligne de commande, sans interface graphique.
+
+Exemples :
+    python cli.py retards --csv retards.csv
+    python cli.py emprunts emprunts.csv
+    python cli.py retours retours.txt
+    python cli.py stats
+    python cli.py compacter
+    python cli.py verifier
+    python cli.py catalogue
+    python cli.py relances --smtp localhost:1025 --expediteur biblio@example.org
+    python cli.py rejouer trace.jsonl.gz --vitesse 10 --guichets 4
+    python cli.py synchroniser ../antenne-nord/bibliotheque.json --nom nord
+"""
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime
+
+from bibliotheque import Bibliotheque
+from integrite import resumer
+from rejeu import rejouer
+from relances import JournalEnvois, PoolSMTP, RelanceRetards
+from replication import Replication
+
+# ===================================================
+# COMMANDES
+# ===================================================
+
+def _lignes(fichier):
+    """Lignes CSV non vides d'un fichier de lot, commentaires (#) ignorés"""
+    with open(fichier, "r", encoding="utf-8", newline="") as f:
+        for numero, ligne in enumerate(csv.reader(f), 1):
+            if ligne and ligne[0].strip() and not ligne[0].startswith("#"):
+                yield numero, [champ.strip() for champ in ligne]
+
+def commande_retards(biblio, args):
+    maintenant = datetime.now()
+    lignes = []
+    for livre in biblio.verifier_retards():
+        user = biblio.utilisateurs.get(livre.emprunteur)
+        lignes.append([
+            livre.isbn,
+            livre.titre,
+            user.nom if user else "Inconnu",
+            livre.date_retour_prevue.strftime("%d/%m/%Y"),
+            (maintenant - livre.date_retour_prevue).days,
+        ])
+
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["isbn", "titre", "emprunteur", "date_retour_prevue", "jours_retard"])
+            writer.writerows(lignes)
+    else:
+        for ligne in lignes:
+            print("\t".join(str(champ) for champ in ligne))
+    print(f"{len(lignes)} livre(s) en retard", file=sys.stderr)
+    return 0
+
+def _sauvegarder(biblio, fichier):
+    """Écrit le fichier de données et signale les anomalies trouvées par le contrôle des modifications"""
+    anomalies = biblio.sauvegarder(fichier)
+    if anomalies:
+        print(f"Contrôle des prêts à la sauvegarde :\n{resumer(anomalies)}", file=sys.stderr)
+
+def _traiter_lot(biblio, args, operation, libelle):
+    reussis, echecs = 0, 0
+    for numero, champs in _lignes(args.fichier_lot):
+        try:
+            ok = operation(champs)
+        except (IndexError, KeyError) as e:
+            ok = False
+            print(f"Ligne {numero}: donnée invalide ({e!r})", file=sys.stderr)
+        if ok:
+            reussis += 1
+        else:
+            echecs += 1
+            print(f"Ligne {numero}: {libelle} impossible: {','.join(champs)}", file=sys.stderr)
+
+    if reussis:
+        _sauvegarder(biblio, args.fichier)
+    print(f"{reussis} {libelle}(s) enregistré(s), {echecs} échec(s)")
+    return 1 if echecs else 0
+
+def commande_emprunts(biblio, args):
+    return _traiter_lot(biblio, args, lambda champs: biblio.emprunter_livre(champs[0], champs[1]), "emprunt")
+
+def commande_retours(biblio, args):
+    return _traiter_lot(biblio, args, lambda champs: biblio.retourner_livre(champs[0]), "retour")
+
+def commande_stats(biblio, args):
+    stats = biblio.get_statistiques()
+    livre = stats["livre_plus_emprunte"]
+    user = stats["utilisateur_plus_actif"]
+    print(f"Livres total: {stats['total_livres']}")
+    print(f"Disponibles: {stats['livres_disponibles']}")
+    print(f"Empruntés: {stats['livres_empruntes']}")
+    print(f"Utilisateurs: {stats['total_utilisateurs']}")
+    print(f"Pénalités totales: {stats['penalites_total']}€")
+    if livre:
+        print(f"Livre le plus emprunté: {livre.titre} ({stats['max_emprunts']} emprunts)")
+    if user:
+        print(f"Utilisateur le plus actif: {user.nom} ({stats['max_livres_empruntes']} emprunts)")
+    return 0
+
+def commande_compacter(biblio, args):
+    """Réécrit entièrement le fichier de données"""
+    _sauvegarder(biblio, args.fichier)
+    print(f"{args.fichier} réécrit ({len(biblio.livres)} livres, {len(biblio.utilisateurs)} utilisateurs)")
+    return 0
+
+def commande_verifier(biblio, args):
+    """Affiche le contrôle des prêts fait au chargement et enregistre les corrections"""
+    rapport = biblio.rapport_integrite
+    if not rapport:
+        print("Aucune anomalie dans l'état des prêts")
+        return 0
+    print(resumer(rapport))
+    corrigees = sum(1 for anomalie in rapport if anomalie[3])
+    if corrigees:
+        _sauvegarder(biblio, args.fichier)
+    print(f"{len(rapport)} anomalie(s), {corrigees} corrigée(s) dans {args.fichier}", file=sys.stderr)
+    return 1 if corrigees < len(rapport) else 0
+
+def commande_catalogue(biblio, args):
+    """Fige les notices dans un catalogue projeté en mémoire, partagé entre processus"""
+    biblio.exporter_catalogue(args.sortie, os.path.dirname(args.fichier))
+    _sauvegarder(biblio, args.fichier)
+    print(f"{args.sortie} écrit ({len(biblio.livres)} livres), "
+          f"{len(biblio.livres.surcouche())} livre(s) dans la surcouche de {args.fichier}")
+    return 0
+
+def commande_relances(biblio, args):
+    hote, _, port = args.smtp.partition(":")
+    pool = PoolSMTP(hote, int(port or 25),
+                    taille=args.connexions,
+                    debit=args.debit,
+                    utilisateur=args.utilisateur_smtp,
+                    mot_de_passe=args.mot_de_passe_smtp,
+                    starttls=args.starttls)
+    journal = JournalEnvois(args.journal)
+    try:
+        bilan = RelanceRetards(biblio, pool, journal, args.expediteur, args.campagne).executer()
+    finally:
+        pool.fermer()
+        journal.fermer()
+    print(f"{bilan['envoyes']} relance(s) envoyée(s), {bilan['deja_envoyes']} déjà envoyée(s), "
+          f"{bilan['sans_email']} emprunteur(s) sans email, {bilan['echecs']} échec(s)")
+    return 1 if bilan["echecs"] else 0
+
+def commande_rejouer(biblio, args):
+    """Rejoue une trace enregistrée ; l'état initial vient de la trace, pas du fichier de données"""
+    try:
+        rapport = rejouer(args.trace, args.vitesse, args.guichets)
+    except (OSError, ValueError) as e:
+        print(f"Rejeu impossible : {e}", file=sys.stderr)
+        return 1
+    print(f"{rapport['appels']} appels en {rapport['duree']:.2f} s ({rapport['debit']:.0f} appels/s), "
+          f"{rapport['erreurs']} erreur(s)")
+    print(f"Latence p50 {rapport['latence_p50_ms']:.2f} ms, p95 {rapport['latence_p95_ms']:.2f} ms, "
+          f"p99 {rapport['latence_p99_ms']:.2f} ms, max {rapport['latence_max_ms']:.2f} ms")
+    if rapport["etat_equivalent"] is None:
+        print("Trace incomplète : état final non vérifié")
+        return 0
+    print("État final identique" if rapport["etat_equivalent"] else "État final DIFFÉRENT de l'enregistrement")
+    return 0 if rapport["etat_equivalent"] else 1
+
+def commande_synchroniser(biblio, args):
+    """Tire les changements d'une autre antenne depuis la dernière synchronisation"""
+    distante = Bibliotheque()
+    distante.charger_donnees(args.distant)
+    nom = args.nom or os.path.abspath(args.distant)
+    depuis = biblio.curseurs.get(nom, 0)
+    appliques = Replication(biblio, distante, nom).synchroniser()
+    _sauvegarder(biblio, args.fichier)
+    print(f"{appliques} changement(s) appliqué(s) depuis {nom} (numéros {depuis} à {biblio.curseurs[nom]})")
+    return 0
+
+# ===================================================
+# POINT D'ENTRÉE
+# ===================================================
+
+def creer_parser():
+    parser = argparse.ArgumentParser(description="Traitements de la Bibliothèque Digitale sans interface graphique")
+    parser.add_argument("--fichier", default="bibliotheque.json", help="fichier de données (défaut: bibliotheque.json)")
+    sous = parser.add_subparsers(dest="commande", required=True)
+
+    retards = sous.add_parser("retards", help="liste les livres en retard")
+    retards.add_argument("--csv", help="exporte le rapport dans un fichier CSV")
+    retards.set_defaults(executer=commande_retards)
+
+    emprunts = sous.add_parser("emprunts", help="enregistre un lot d'emprunts (lignes isbn,id_utilisateur)")
+    emprunts.add_argument("fichier_lot")
+    emprunts.set_defaults(executer=commande_emprunts)
+
+    retours = sous.add_parser("retours", help="enregistre un lot de retours (une ligne isbn par retour)")
+    retours.add_argument("fichier_lot")
+    retours.set_defaults(executer=commande_retours)
+
+    stats = sous.add_parser("stats", help="affiche les statistiques")
+    stats.set_defaults(executer=commande_stats)
+
+    compacter = sous.add_parser("compacter", help="réécrit le fichier de données")
+    compacter.set_defaults(executer=commande_compacter)
+
+    verifier = sous.add_parser("verifier", help="contrôle la cohérence des prêts et corrige ce qui peut l'être")
+    verifier.set_defaults(executer=commande_verifier)
+
+    catalogue = sous.add_parser("catalogue", help="écrit le catalogue en lecture seule et allège le fichier de données")
+    catalogue.add_argument("--sortie", default="catalogue.bin", help="nom du catalogue, relatif au fichier de données")
+    catalogue.set_defaults(executer=commande_catalogue)
+
+    relances = sous.add_parser("relances", help="envoie un email à chaque emprunteur en retard")
+    relances.add_argument("--smtp", default="localhost:25", help="serveur SMTP hote:port")
+    relances.add_argument("--expediteur", required=True)
+    relances.add_argument("--utilisateur-smtp")
+    relances.add_argument("--mot-de-passe-smtp")
+    relances.add_argument("--starttls", action="store_true")
+    relances.add_argument("--connexions", type=int, default=4, help="connexions SMTP simultanées")
+    relances.add_argument("--debit", type=float, default=20, help="messages par seconde au maximum")
+    relances.add_argument("--journal", default="relances.log", help="journal des envois, pour la reprise")
+    relances.add_argument("--campagne", help="identifiant de campagne (défaut: date du jour)")
+    relances.set_defaults(executer=commande_relances)
+
+    rejeu = sous.add_parser("rejouer", help="rejoue une trace enregistrée avec BIBLIO_TRACE")
+    rejeu.add_argument("trace")
+    rejeu.add_argument("--vitesse", type=float, default=1.0, help="facteur d'accélération (0 = sans attente)")
+    rejeu.add_argument("--guichets", type=int, default=1, help="nombre de guichets simulés")
+    rejeu.set_defaults(executer=commande_rejouer, sans_donnees=True)
+
+    synchro = sous.add_parser("synchroniser", help="applique les changements d'une autre antenne")
+    synchro.add_argument("distant", help="fichier de données de l'autre antenne")
+    synchro.add_argument("--nom", help="nom de l'antenne pour le suivi des changements reçus (défaut: chemin du fichier)")
+    synchro.set_defaults(executer=commande_synchroniser)
+
+    return parser
+
+def main(argv=None):
+    args = creer_parser().parse_args(argv)
+    biblio = None
+    if not getattr(args, "sans_donnees", False):
+        biblio = Bibliotheque()
+        biblio.charger_donnees(args.fichier)
+    return args.executer(biblio, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
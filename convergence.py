@@ -0,0 +1,144 @@
+"""Banc de convergence de la réplication entre deux antennes.
+
+Deux bibliothèques en mémoire reçoivent chacune des opérations tirées au
+hasard (emprunts, retours, ajouts, suppressions, paramètres), entrecoupées de
+synchronisations dans un sens ou dans l'autre. Une fois les deux fils
+épuisés, les deux antennes doivent avoir les mêmes livres, les mêmes
+utilisateurs et les mêmes paramètres, sans anomalie de prêt.
+
+Être d'accord ne suffit pas : chaque utilisateur doit aussi garder tous les
+emprunts et toutes les pénalités notés sur l'une ou l'autre antenne. Un même
+emprunt rendu en retard sur les deux antennes n'est pénalisé qu'une fois.
+
+Exemple :
+    python convergence.py --graines 200
+"""
+import argparse
+import random
+import sys
+from datetime import timedelta
+
+from bibliotheque import Bibliotheque, Livre, Utilisateur
+from integrite import resumer, verifier_tout
+from replication import Replication
+
+def _operation(biblio, alea):
+    """Applique une opération tirée au hasard ; les isbn et identifiants inconnus sont voulus"""
+    tirage = alea.random()
+    isbn = str(alea.randint(0, 34))
+    id_user = str(alea.randint(0, 4))
+    if tirage < 0.4:
+        biblio.emprunter_livre(isbn, id_user)
+    elif tirage < 0.75:
+        if isbn in biblio.livres:
+            livre = biblio.livres[isbn]
+            # Un retour sur trois est en retard, pour produire des pénalités
+            if not livre.disponible and livre.date_retour_prevue and alea.random() < 0.3:
+                livre.date_retour_prevue -= timedelta(days=alea.randint(1, 10))
+            biblio.retourner_livre(isbn)
+    elif tirage < 0.8:
+        biblio.supprimer_livre(isbn)
+    elif tirage < 0.88:
+        biblio.ajouter_livre(Livre(f"Nouveau {isbn}", "Auteur", isbn))
+    elif tirage < 0.92:
+        biblio.ajouter_utilisateur(Utilisateur(f"Lecteur {id_user}", id_user))
+    else:
+        biblio.modifier_parametres(alea.randint(1, 20), 0.5)
+
+def _bilan(biblio):
+    """{id_utilisateur: (nombre d'emprunts de l'historique, retards notés)}"""
+    return {id_user: (len(user.historique_emprunts), list(user.retards))
+            for id_user, user in biblio.utilisateurs.items()}
+
+def _etat(biblio):
+    """État comparable d'une antenne ; l'ordre des prêts en cours d'un utilisateur n'est pas significatif"""
+    livres = {isbn: livre.to_dict() for isbn, livre in biblio.livres.items()}
+    utilisateurs = {}
+    for id_user, user in biblio.utilisateurs.items():
+        d = user.to_dict()
+        d["livres_empruntes"] = sorted(d["livres_empruntes"])
+        utilisateurs[id_user] = d
+    return livres, utilisateurs, (biblio.duree_emprunt, biblio.taux_penalite)
+
+def verifier_convergence(graine, tours=30, operations=5, max_synchronisations=20):
+    """Joue un scénario aléatoire reproductible ; retourne la liste des écarts constatés (vide si convergence)"""
+    alea = random.Random(graine)
+    a, b = Bibliotheque(), Bibliotheque()
+    for i in range(4):
+        a.ajouter_utilisateur(Utilisateur(f"Lecteur {i}", str(i)))
+    for i in range(30):
+        a.ajouter_livre(Livre(f"Titre {i}", "Auteur", str(i)))
+    vers_b = Replication(b, a, "A")
+    vers_a = Replication(a, b, "B")
+    vers_b.synchroniser()
+
+    # Emprunts et retards ajoutés par les opérations, toutes antennes confondues :
+    # id_utilisateur -> [nombre d'emprunts, {(isbn, date d'emprunt): montant}]
+    attendus = {}
+    for _ in range(tours):
+        for biblio in (a, b):
+            for _ in range(operations):
+                avant = _bilan(biblio)
+                _operation(biblio, alea)
+                for id_user, (emprunts, retards) in _bilan(biblio).items():
+                    emprunts_avant, retards_avant = avant.get(id_user, (0, []))
+                    total = attendus.setdefault(id_user, [0, {}])
+                    total[0] += emprunts - emprunts_avant
+                    for isbn, date, montant in retards[len(retards_avant):]:
+                        total[1][(isbn, date)] = max(montant, total[1].get((isbn, date), montant))
+        if alea.random() < 0.5:
+            vers_b.synchroniser()
+        if alea.random() < 0.5:
+            vers_a.synchroniser()
+
+    ecarts = []
+    for _ in range(max_synchronisations):
+        if vers_b.synchroniser() + vers_a.synchroniser() == 0:
+            break
+    else:
+        ecarts.append(f"les synchronisations ne s'arrêtent pas après {max_synchronisations} allers-retours")
+
+    livres_a, utilisateurs_a, parametres_a = _etat(a)
+    livres_b, utilisateurs_b, parametres_b = _etat(b)
+    for isbn in sorted(livres_a.keys() | livres_b.keys()):
+        if livres_a.get(isbn) != livres_b.get(isbn):
+            ecarts.append(f"livre {isbn} : {livres_a.get(isbn)} / {livres_b.get(isbn)}")
+    for id_user in sorted(utilisateurs_a.keys() | utilisateurs_b.keys()):
+        if utilisateurs_a.get(id_user) != utilisateurs_b.get(id_user):
+            ecarts.append(f"utilisateur {id_user} : {utilisateurs_a.get(id_user)} / {utilisateurs_b.get(id_user)}")
+    if parametres_a != parametres_b:
+        ecarts.append(f"paramètres : {parametres_a} / {parametres_b}")
+    for id_user, (emprunts, retards) in sorted(attendus.items()):
+        user = a.utilisateurs.get(id_user)
+        penalites = round(sum(retards.values()), 2)
+        if user is None:
+            ecarts.append(f"utilisateur {id_user} perdu")
+        elif user.penalites != penalites or len(user.historique_emprunts) != emprunts:
+            ecarts.append(f"utilisateur {id_user} : {user.penalites}€ et {len(user.historique_emprunts)} "
+                          f"emprunt(s) au lieu de {penalites}€ et {emprunts}")
+    for nom, biblio in (("A", a), ("B", b)):
+        anomalies, _ = verifier_tout(biblio, reparer=False)
+        if anomalies:
+            ecarts.append(f"anomalies sur {nom} :\n{resumer(anomalies)}")
+    return ecarts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vérifie que deux antennes synchronisées convergent")
+    parser.add_argument("--graines", type=int, default=100, help="nombre de scénarios joués (défaut: 100)")
+    parser.add_argument("--depart", type=int, default=0, help="première graine (défaut: 0)")
+    parser.add_argument("--tours", type=int, default=30, help="tours d'opérations par scénario (défaut: 30)")
+    args = parser.parse_args(argv)
+
+    echecs = 0
+    for graine in range(args.depart, args.depart + args.graines):
+        ecarts = verifier_convergence(graine, args.tours)
+        if ecarts:
+            echecs += 1
+            print(f"Graine {graine} : {len(ecarts)} écart(s)", file=sys.stderr)
+            for ecart in ecarts:
+                print(f"  {ecart}", file=sys.stderr)
+    print(f"{args.graines - echecs}/{args.graines} scénario(s) convergent")
+    return 1 if echecs else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Vignettes des couvertures de livres, produites en arrière-plan.
+
+Une image de couverture n'est décodée et réduite qu'une seule fois : la
+vignette est rangée dans un cache disque adressé par le contenu de l'image
+(deux livres qui partagent la même couverture partagent la même vignette),
+dont la taille est bornée en évinçant les vignettes les moins récemment
+utilisées. Le décodage se fait dans un petit pool de threads ; les vignettes
+prêtes sont remises à l'interface depuis la boucle Tk, seul thread autorisé
+à toucher aux widgets.
+"""
+import hashlib
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+TAILLE_VIGNETTE = (48, 64)
+
+# ===================================================
+# CACHE DISQUE
+# ===================================================
+
+class CacheVignettes:
+    """Vignettes PNG nommées d'après l'empreinte de l'image source, évincées par ancienneté d'usage"""
+
+    def __init__(self, dossier, taille_max=50 * 1024 * 1024, taille=TAILLE_VIGNETTE):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.taille = taille
+        self.verrou = threading.Lock()
+        # (chemin, date de modification, taille) -> empreinte, pour ne pas relire les sources inchangées
+        self.empreintes = {}
+        # nom de fichier -> octets, du moins récemment utilisé au plus récent
+        self.fichiers = OrderedDict()
+        self.total = 0
+        os.makedirs(dossier, exist_ok=True)
+        # L'ordre d'usage survit au redémarrage grâce à la date de modification des vignettes
+        existants = []
+        for entree in os.scandir(dossier):
+            if entree.is_file() and entree.name.endswith(".png"):
+                infos = entree.stat()
+                existants.append((infos.st_mtime, entree.name, infos.st_size))
+        for _, nom, octets in sorted(existants):
+            self.fichiers[nom] = octets
+            self.total += octets
+
+    def cle(self, chemin):
+        """Nom de la vignette d'une image : empreinte du contenu et des dimensions demandées"""
+        infos = os.stat(chemin)
+        signature = (chemin, infos.st_mtime_ns, infos.st_size)
+        empreinte = self.empreintes.get(signature)
+        if empreinte is None:
+            h = hashlib.sha256(f"{self.taille[0]}x{self.taille[1]}:".encode("ascii"))
+            with open(chemin, "rb") as f:
+                for bloc in iter(lambda: f.read(1 << 16), b""):
+                    h.update(bloc)
+            empreinte = h.hexdigest()
+            self.empreintes[signature] = empreinte
+        return f"{empreinte}.png"
+
+    def lire(self, nom):
+        """Retourne la vignette en cache, ou None"""
+        with self.verrou:
+            if nom not in self.fichiers:
+                return None
+            self.fichiers.move_to_end(nom)
+        fichier = os.path.join(self.dossier, nom)
+        try:
+            os.utime(fichier)
+            with Image.open(fichier) as image:
+                image.load()
+                return image
+        except OSError:
+            # Vignette effacée ou abîmée hors de l'application : elle sera reproduite
+            with self.verrou:
+                self.total -= self.fichiers.pop(nom, 0)
+            return None
+
+    def ecrire(self, nom, image):
+        fichier = os.path.join(self.dossier, nom)
+        temporaire = f"{fichier}.{threading.get_ident()}.tmp"
+        image.save(temporaire, format="PNG")
+        os.replace(temporaire, fichier)
+        octets = os.path.getsize(fichier)
+        with self.verrou:
+            self.total += octets - self.fichiers.pop(nom, 0)
+            self.fichiers[nom] = octets
+            while self.total > self.taille_max and len(self.fichiers) > 1:
+                ancien, taille = self.fichiers.popitem(last=False)
+                self.total -= taille
+                try:
+                    os.remove(os.path.join(self.dossier, ancien))
+                except FileNotFoundError:
+                    pass
+
+    def vignette(self, chemin):
+        """Vignette d'une image, depuis le cache ou en décodant la source (à appeler hors de la boucle Tk)"""
+        nom = self.cle(chemin)
+        image = self.lire(nom)
+        if image is not None:
+            return image
+        with Image.open(chemin) as source:
+            # Pour un JPEG, décode directement à une résolution réduite
+            source.draft("RGB", self.taille)
+            source.thumbnail(self.taille)
+            image = source.convert("RGB")
+        self.ecrire(nom, image)
+        return image
+
+# ===================================================
+# CHARGEMENT EN ARRIÈRE-PLAN
+# ===================================================
+
+class ChargeurVignettes:
+    """Produit les vignettes dans un pool de threads et les remet dans la boucle Tk"""
+
+    def __init__(self, cache, programmer, ouvriers=2, en_memoire=200):
+        self.cache = cache
+        # programmer(delai_ms, fonction) : root.after
+        self.programmer = programmer
+        self.pool = ThreadPoolExecutor(max_workers=ouvriers)
+        self.prets = queue.Queue()
+        self.memoire = OrderedDict()
+        self.en_memoire = en_memoire
+        self.echecs = set()
+        # chemin -> (rappel, abandon) en attente de la vignette
+        self.en_cours = {}
+        self.voulus = None
+        self.releve_programme = False
+
+    def garder(self, chemins):
+        """Limite le travail aux couvertures encore affichées ; les demandes pour les autres sont abandonnées"""
+        self.voulus = set(chemins)
+
+    def demander(self, chemin, rappel, abandon=None):
+        """Appelle rappel(image PIL ou None) dans la boucle Tk, tout de suite si la vignette est en mémoire.
+
+        abandon(), s'il est donné, est appelé dans la boucle Tk quand la demande est abandonnée par garder().
+        """
+        if chemin in self.memoire:
+            self.memoire.move_to_end(chemin)
+            rappel(self.memoire[chemin])
+            return
+        if chemin in self.echecs:
+            rappel(None)
+            return
+        if chemin in self.en_cours:
+            self.en_cours[chemin].append((rappel, abandon))
+            return
+        self.en_cours[chemin] = [(rappel, abandon)]
+        self.pool.submit(self._produire, chemin)
+        if not self.releve_programme:
+            self.releve_programme = True
+            self.programmer(30, self._relever)
+
+    def _produire(self, chemin):
+        voulus = self.voulus
+        if voulus is not None and chemin not in voulus:
+            self.prets.put((chemin, None, False))
+            return
+        try:
+            self.prets.put((chemin, self.cache.vignette(chemin), True))
+        except Exception:
+            # Fichier illisible, image invalide ou trop grande (DecompressionBombError) :
+            # la demande doit aboutir, sinon le chemin resterait en cours indéfiniment
+            self.prets.put((chemin, None, True))
+
+    def _relever(self):
+        while True:
+            try:
+                chemin, image, traite = self.prets.get_nowait()
+            except queue.Empty:
+                break
+            rappels = self.en_cours.pop(chemin, [])
+            if not traite:
+                voulus = self.voulus
+                if rappels and (voulus is None or chemin in voulus):
+                    # Redemandée depuis l'abandon : la vignette est de nouveau affichée
+                    self.en_cours[chemin] = rappels
+                    self.pool.submit(self._produire, chemin)
+                else:
+                    for _, abandon in rappels:
+                        if abandon is not None:
+                            abandon()
+                continue
+            if image is None:
+                self.echecs.add(chemin)
+            else:
+                self.memoire[chemin] = image
+                if len(self.memoire) > self.en_memoire:
+                    self.memoire.popitem(last=False)
+            for rappel, _ in rappels:
+                rappel(image)
+        if self.en_cours:
+            self.programmer(30, self._relever)
+        else:
+            self.releve_programme = False
+
+    def fermer(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
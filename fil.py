@@ -0,0 +1,115 @@
+"""Fil des changements, journalisé à côté du fichier de données.
+
+Le fil associe à chaque enregistrement changé (type, cle) le numéro de son
+dernier changement ; il contient tout ce qui a été modifié depuis la création
+de la bibliothèque. Le réécrire à chaque sauvegarde et le relire à chaque
+démarrage coûterait autant que le catalogue : il est donc tenu dans un journal
+JSON lines, une ligne [numero, type, cle] par changement, où chaque sauvegarde
+ajoute seulement ses changements. Le journal n'est lu qu'au premier besoin
+(synchronisation) ; une ligne plus récente remplace les précédentes pour le
+même enregistrement, et le journal est compacté quand les lignes remplacées
+dominent.
+
+Le fichier de données retient la taille du journal à la fin de la sauvegarde :
+ce qui a été ajouté au-delà par une sauvegarde interrompue est ignoré à la
+lecture et effacé par l'ajout suivant.
+"""
+import json
+import os
+from collections import OrderedDict
+
+class FilChangements:
+    def __init__(self, journal=None, taille=0):
+        # Chemin du journal, None tant que le fil n'a jamais été écrit
+        self.journal = journal
+        # Octets du journal couverts par le fichier de données
+        self.taille = taille
+        # (type, cle) -> numéro, du plus ancien au plus récent ; None tant que le journal n'est pas lu
+        self.entrees = None if journal else OrderedDict()
+        # Lignes du journal, connu une fois le journal lu ou écrit en entier
+        self.lignes = 0
+        # Changements pas encore ajoutés au journal
+        self.en_attente = OrderedDict()
+
+    def enregistrer(self, type_, cle, numero):
+        for fil in (self.en_attente, self.entrees):
+            if fil is not None:
+                fil[(type_, cle)] = numero
+                fil.move_to_end((type_, cle))
+
+    def _charger(self):
+        if self.entrees is not None:
+            return self.entrees
+        entrees = OrderedDict()
+        self.lignes = 0
+        try:
+            with open(self.journal, "rb") as f:
+                contenu = f.read(self.taille)
+        except FileNotFoundError:
+            contenu = b""
+        for ligne in contenu.decode("utf-8", errors="replace").splitlines():
+            try:
+                numero, type_, cle = json.loads(ligne)
+            except ValueError:
+                # Journal compacté par une sauvegarde interrompue : la taille retenue tombe dans une ligne
+                continue
+            entrees[(type_, cle)] = numero
+            entrees.move_to_end((type_, cle))
+            self.lignes += 1
+        for (type_, cle), numero in self.en_attente.items():
+            entrees[(type_, cle)] = numero
+            entrees.move_to_end((type_, cle))
+        self.entrees = entrees
+        return entrees
+
+    def get(self, cle, defaut=None):
+        """Numéro du dernier changement de l'enregistrement (type, cle)"""
+        return self._charger().get(cle, defaut)
+
+    def depuis(self, numero):
+        """[(numero, type, cle)...] des changements postérieurs à numero, du plus ancien au plus récent"""
+        resultat = []
+        for (type_, cle), n in reversed(self._charger().items()):
+            if n <= numero:
+                break
+            resultat.append((n, type_, cle))
+        resultat.reverse()
+        return resultat
+
+    def ecrire(self, journal):
+        """Reporte les changements en attente dans le journal, avant l'écriture du fichier de données"""
+        reecrire = journal != self.journal or (
+            self.entrees is not None and self.lignes > 2 * len(self.entrees) + 1000)
+        if reecrire:
+            entrees = self._charger()
+            if entrees or self.journal is not None:
+                self._reecrire(journal, entrees)
+                self.journal = journal
+        elif self.en_attente:
+            self._ajouter(journal, self.en_attente)
+        self.en_attente.clear()
+
+    def _ajouter(self, journal, changements):
+        # Efface la fin laissée par une sauvegarde interrompue
+        taille = min(self.taille, os.path.getsize(journal)) if os.path.exists(journal) else 0
+        with open(journal, "r+b" if taille else "wb") as f:
+            f.truncate(taille)
+            f.seek(taille)
+            f.write(_lignes(changements).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            self.taille = f.tell()
+        self.lignes += len(changements)
+
+    def _reecrire(self, journal, entrees):
+        temporaire = f"{journal}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            f.write(_lignes(entrees))
+            f.flush()
+            os.fsync(f.fileno())
+            self.taille = f.tell()
+        os.replace(temporaire, journal)
+        self.lignes = len(entrees)
+
+def _lignes(changements):
+    return "".join(json.dumps([numero, type_, cle]) + "\n" for (type_, cle), numero in changements.items())
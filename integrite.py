@@ -0,0 +1,168 @@
+"""Cohérence de l'état des prêts.
+
+Un prêt est décrit trois fois : Livre.disponible, Livre.emprunteur et
+Utilisateur.livres_empruntes. Le contrôle complet est fait au chargement ;
+ensuite chaque modification signale seulement le livre ou l'utilisateur
+touché, et ces enregistrements sont contrôlés avant chaque écriture du
+fichier de données.
+
+Le livre fait foi : disponible décide s'il est prêté, emprunteur à qui, et
+les listes des utilisateurs sont corrigées en conséquence. Un livre prêté
+sans emprunteur est rendu à l'utilisateur qui est seul à le lister, sinon
+remis en rayon. Un emprunteur inconnu ou une clé différente de l'isbn sont
+signalés mais pas corrigés : il faudrait inventer une donnée.
+
+Une anomalie est un tuple (code, cle, message, corrigee).
+"""
+from catalogue import LivresCatalogue
+
+def _rendre_disponible(livre):
+    livre.disponible = True
+    livre.emprunteur = None
+    livre.date_emprunt = None
+    livre.date_retour_prevue = None
+
+def _lecteurs(biblio, isbn):
+    """Identifiants des utilisateurs qui listent ce livre parmi leurs prêts en cours"""
+    return [id_user for id_user, user in biblio.utilisateurs.items() if isbn in user.livres_empruntes]
+
+def verifier_livre(biblio, cle, livre, lecteurs, reparer=True):
+    """Contrôle un livre ; lecteurs(cle) donne les utilisateurs qui le listent.
+
+    Retourne (anomalies, {(evenement, cle)} des enregistrements corrigés).
+    """
+    anomalies, corriges = [], set()
+    if livre.isbn != cle:
+        anomalies.append(("cle_isbn", cle, f"Livre {cle} : isbn {livre.isbn} différent de sa clé", False))
+
+    if livre.disponible and livre.emprunteur is not None:
+        anomalies.append(("etat_incoherent", cle, f"Livre {cle} disponible mais prêté à {livre.emprunteur}", reparer))
+        if reparer:
+            _rendre_disponible(livre)
+            corriges.add(("livre_modifie", cle))
+    elif not livre.disponible and livre.emprunteur is None:
+        candidats = lecteurs(cle)
+        if len(candidats) == 1:
+            message = f"Livre {cle} prêté sans emprunteur, rendu à {candidats[0]} qui le liste"
+        else:
+            message = f"Livre {cle} prêté sans emprunteur, remis en rayon"
+        anomalies.append(("etat_incoherent", cle, message, reparer))
+        if reparer:
+            if len(candidats) == 1:
+                livre.emprunteur = candidats[0]
+            else:
+                _rendre_disponible(livre)
+            corriges.add(("livre_modifie", cle))
+
+    if not livre.disponible:
+        user = biblio.utilisateurs.get(livre.emprunteur)
+        if user is None:
+            anomalies.append(("emprunteur_inconnu", cle,
+                              f"Livre {cle} prêté à un utilisateur inconnu ({livre.emprunteur})", False))
+        elif cle not in user.livres_empruntes:
+            anomalies.append(("pret_non_liste", cle,
+                              f"Livre {cle} absent des prêts de {livre.emprunteur}", reparer))
+            if reparer:
+                user.livres_empruntes.append(cle)
+                corriges.add(("utilisateur_modifie", livre.emprunteur))
+
+    if reparer:
+        for evenement, cle_corrigee in corriges:
+            enregistrement = livre if evenement == "livre_modifie" else biblio.utilisateurs[cle_corrigee]
+            enregistrement.marquer_modifie()
+    return anomalies, corriges
+
+def verifier_utilisateur(biblio, id_user, user, reparer=True):
+    """Contrôle la liste des prêts en cours d'un utilisateur ; retourne (anomalies, corrigés)"""
+    anomalies, gardes, vus = [], [], set()
+    for isbn in user.livres_empruntes:
+        livre = biblio.livres.get(isbn)
+        if isbn in vus:
+            anomalies.append(("doublon", id_user, f"Utilisateur {id_user} : prêt {isbn} listé deux fois", reparer))
+        elif livre is None:
+            anomalies.append(("livre_inconnu", id_user, f"Utilisateur {id_user} : livre {isbn} inexistant", reparer))
+        elif livre.disponible or livre.emprunteur != id_user:
+            anomalies.append(("pret_fantome", id_user,
+                              f"Utilisateur {id_user} : livre {isbn} listé mais pas prêté à lui", reparer))
+        else:
+            gardes.append(isbn)
+        vus.add(isbn)
+
+    if not reparer or len(gardes) == len(user.livres_empruntes):
+        return anomalies, set()
+    user.livres_empruntes = gardes
+    user.marquer_modifie()
+    return anomalies, {("utilisateur_modifie", id_user)}
+
+def verifier_tout(biblio, reparer=True):
+    """Contrôle complet ; retourne (anomalies, corrigés).
+
+    Avec un catalogue, seuls les livres de la surcouche sont parcourus : une
+    notice jamais touchée est disponible et sans emprunteur par construction.
+    """
+    lecteurs = {}
+    for id_user, user in biblio.utilisateurs.items():
+        for isbn in user.livres_empruntes:
+            lecteurs.setdefault(isbn, []).append(id_user)
+
+    # Les corrections ne changent que des attributs : les dictionnaires sont parcourus sans copie
+    livres = biblio.livres.materialises if isinstance(biblio.livres, LivresCatalogue) else biblio.livres
+
+    anomalies, corriges = [], set()
+    for cle, livre in livres.items():
+        # Cas courant, testé sans appel de fonction : livre en rayon sans emprunteur
+        if livre.disponible and livre.emprunteur is None and livre.isbn == cle:
+            continue
+        a, c = verifier_livre(biblio, cle, livre, lambda isbn: lecteurs.get(isbn, []), reparer)
+        anomalies += a
+        corriges |= c
+    # Les listes sont contrôlées contre les livres déjà corrigés
+    for id_user, user in biblio.utilisateurs.items():
+        a, c = verifier_utilisateur(biblio, id_user, user, reparer)
+        anomalies += a
+        corriges |= c
+    return anomalies, corriges
+
+class ControleIntegrite:
+    """Retient les enregistrements modifiés pour ne contrôler qu'eux avant l'écriture"""
+
+    def __init__(self, biblio):
+        self.biblio = biblio
+        self.livres = set()
+        self.utilisateurs = set()
+
+    def on_changement(self, evenement, cle):
+        if evenement == "recharge":
+            self.livres.clear()
+            self.utilisateurs.clear()
+        elif evenement.startswith("livre_"):
+            self.livres.add(cle)
+        elif evenement.startswith("utilisateur_"):
+            self.utilisateurs.add(cle)
+
+    def verifier_modifies(self, reparer=True):
+        """Contrôle les enregistrements modifiés depuis le dernier appel ; retourne (anomalies, corrigés)"""
+        livres, self.livres = self.livres, set()
+        utilisateurs, self.utilisateurs = self.utilisateurs, set()
+        anomalies, corriges = [], set()
+        for isbn in livres:
+            livre = self.biblio.livres.get(isbn)
+            if livre is None:
+                # Livre supprimé : personne ne doit plus le lister (rare, parcours des utilisateurs)
+                utilisateurs.update(_lecteurs(self.biblio, isbn))
+                continue
+            a, c = verifier_livre(self.biblio, isbn, livre, lambda cle: _lecteurs(self.biblio, cle), reparer)
+            anomalies += a
+            corriges |= c
+        for id_user in utilisateurs:
+            user = self.biblio.utilisateurs.get(id_user)
+            if user is not None:
+                a, c = verifier_utilisateur(self.biblio, id_user, user, reparer)
+                anomalies += a
+                corriges |= c
+        return anomalies, corriges
+
+def resumer(anomalies):
+    """Texte du rapport, une anomalie par ligne"""
+    return "\n".join(f"{'corrigé' if corrigee else 'à traiter'} : {message}"
+                     for _, _, message, corrigee in anomalies)
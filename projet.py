@@ -1,227 +1,52 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog
-import json
-from datetime import datetime, timedelta
 import customtkinter as ctk
 import os
 from PIL import Image, ImageTk
 
-# ===================================================
-# CLASSES MÉTIER
-# ===================================================
-
-class Livre:
-    def __init__(self, titre, auteur, isbn):
-        self.titre = titre
-        self.auteur = auteur
-        self.isbn = isbn
-        self.disponible = True
-        self.emprunteur = None
-        self.date_emprunt = None
-        self.date_retour_prevue = None
-        self.nombre_emprunts = 0
-
-    def to_dict(self):
-        return {
-            "titre": self.titre,
-            "auteur": self.auteur,
-            "isbn": self.isbn,
-            "disponible": self.disponible,
-            "emprunteur": self.emprunteur,
-            "date_emprunt": self.date_emprunt.isoformat() if self.date_emprunt else None,
-            "date_retour_prevue": self.date_retour_prevue.isoformat() if self.date_retour_prevue else None,
-            "nombre_emprunts": self.nombre_emprunts
-        }
-
-class Utilisateur:
-    def __init__(self, nom, id_utilisateur):
-        self.nom = nom
-        self.id_utilisateur = id_utilisateur
-        self.livres_empruntes = []
-        self.historique_emprunts = []
-        self.penalites = 0.0
-
-    def to_dict(self):
-        return {
-            "nom": self.nom,
-            "id_utilisateur": self.id_utilisateur,
-            "livres_empruntes": self.livres_empruntes,
-            "historique_emprunts": self.historique_emprunts,
-            "penalites": self.penalites
-        }
-
-class Bibliotheque:
-    def __init__(self):
-        self.livres = {}
-        self.utilisateurs = {}
-        self.duree_emprunt = 14
-        self.taux_penalite = 0.5
-
-    def sauvegarder(self, fichier="bibliotheque.json"):
-        with open(fichier, "w", encoding="utf-8") as f:
-            json.dump({
-                "livres": {isbn: livre.to_dict() for isbn, livre in self.livres.items()},
-                "utilisateurs": {id_user: user.to_dict() for id_user, user in self.utilisateurs.items()},
-                "duree_emprunt": self.duree_emprunt,
-                "taux_penalite": self.taux_penalite
-            }, f, indent=4)
-
-    def charger_donnees(self, fichier="bibliotheque.json"):
-        try:
-            with open(fichier, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                
-            self.livres = {}
-            for isbn, d in data["livres"].items():
-                livre = Livre(d["titre"], d["auteur"], d["isbn"])
-                livre.disponible = d["disponible"]
-                livre.emprunteur = d["emprunteur"]
-                livre.date_emprunt = datetime.fromisoformat(d["date_emprunt"]) if d["date_emprunt"] else None
-                livre.date_retour_prevue = datetime.fromisoformat(d["date_retour_prevue"]) if d["date_retour_prevue"] else None
-                livre.nombre_emprunts = d["nombre_emprunts"]
-                self.livres[isbn] = livre
-                
-            self.utilisateurs = {}
-            for id_user, u in data["utilisateurs"].items():
-                user = Utilisateur(u["nom"], u["id_utilisateur"])
-                user.livres_empruntes = u["livres_empruntes"]
-                user.historique_emprunts = u["historique_emprunts"]
-                user.penalites = u["penalites"]
-                self.utilisateurs[id_user] = user
-                
-            self.duree_emprunt = data["duree_emprunt"]
-            self.taux_penalite = data["taux_penalite"]
-        except FileNotFoundError:
-            self.sauvegarder()
-
-    def ajouter_livre(self, livre):
-        if livre.isbn in self.livres:
-            return False
-        self.livres[livre.isbn] = livre
-        return True
-
-    def supprimer_livre(self, isbn):
-        if isbn in self.livres:
-            if not self.livres[isbn].disponible:
-                return False
-            del self.livres[isbn]
-            return True
-        return False
-
-    def ajouter_utilisateur(self, utilisateur):
-        if utilisateur.id_utilisateur in self.utilisateurs:
-            return False
-        self.utilisateurs[utilisateur.id_utilisateur] = utilisateur
-        return True
-
-    def emprunter_livre(self, isbn, id_user):
-        if isbn not in self.livres or id_user not in self.utilisateurs:
-            return False
-        
-        livre = self.livres[isbn]
-        user = self.utilisateurs[id_user]
-        
-        if not livre.disponible:
-            return False
-        
-        livre.disponible = False
-        livre.emprunteur = id_user
-        livre.date_emprunt = datetime.now()
-        livre.date_retour_prevue = livre.date_emprunt + timedelta(days=self.duree_emprunt)
-        livre.nombre_emprunts += 1
-        
-        user.livres_empruntes.append(isbn)
-        user.historique_emprunts.append(isbn)
-        return True
-
-    def retourner_livre(self, isbn):
-        if isbn not in self.livres or self.livres[isbn].disponible:
-            return False
-        
-        livre = self.livres[isbn]
-        user = self.utilisateurs[livre.emprunteur]
-        
-        if datetime.now() > livre.date_retour_prevue:
-            jours_retard = (datetime.now() - livre.date_retour_prevue).days
-            user.penalites += jours_retard * self.taux_penalite
-        
-        livre.disponible = True
-        livre.emprunteur = None
-        livre.date_emprunt = None
-        livre.date_retour_prevue = None
-        user.livres_empruntes.remove(isbn)
-        return True
-
-    def rechercher_livre(self, critere, valeur):
-        """Recherche des livres selon un critère et une valeur"""
-        resultats = []
-        
-        for isbn, livre in self.livres.items():
-            if critere == "titre" and valeur.lower() in livre.titre.lower():
-                resultats.append(livre)
-            elif critere == "auteur" and valeur.lower() in livre.auteur.lower():
-                resultats.append(livre)
-            elif critere == "isbn" and valeur == isbn:
-                resultats.append(livre)
-                
-        return resultats
-
-    def afficher_livres_disponibles(self):
-        """Retourne la liste des livres disponibles"""
-        return [livre for livre in self.livres.values() if livre.disponible]
-
-    def verifier_retards(self):
-        """Identifie les livres qui sont en retard"""
-        livres_en_retard = []
-        
-        for isbn, livre in self.livres.items():
-            if not livre.disponible and datetime.now() > livre.date_retour_prevue:
-                livres_en_retard.append(livre)
-        
-        return livres_en_retard
-    def supprimer_livre(self, isbn):
-        if isbn in self.livres:
-            del self.livres[isbn]
-            return f"Livre avec ISBN '{isbn}' supprimé avec succès"
-        return "Livre non trouvé"
-
-    def get_statistiques(self):
-        stats = {
-            "total_livres": len(self.livres),
-            "livres_disponibles": sum(1 for l in self.livres.values() if l.disponible),
-            "livres_empruntes": sum(1 for l in self.livres.values() if not l.disponible),
-            "total_utilisateurs": len(self.utilisateurs),
-            "penalites_total": sum(u.penalites for u in self.utilisateurs.values()),
-            "livre_plus_emprunte": None,
-            "max_emprunts": 0,
-            "utilisateur_plus_actif": None,
-            "max_livres_empruntes": 0
-        }
-        
-        # Trouver le livre le plus emprunté
-        for livre in self.livres.values():
-            if livre.nombre_emprunts > stats["max_emprunts"]:
-                stats["max_emprunts"] = livre.nombre_emprunts
-                stats["livre_plus_emprunte"] = livre
-        
-        # Trouver l'utilisateur le plus actif
-        for user in self.utilisateurs.values():
-            if len(user.historique_emprunts) > stats["max_livres_empruntes"]:
-                stats["max_livres_empruntes"] = len(user.historique_emprunts)
-                stats["utilisateur_plus_actif"] = user
-        
-        return stats
+from bibliotheque import Bibliotheque, Livre, PlanificateurSauvegarde, Utilisateur
+from couvertures import TAILLE_VIGNETTE, CacheVignettes, ChargeurVignettes
+from integrite import resumer
+from rejeu import EnregistreurAppels
+from surveillance import SurveillanceBoucle
 
 # ===================================================
 # INTERFACE GRAPHIQUE
 # ===================================================
 
+TAILLE_PAGE_LIVRES = 50
+
+# Libellé affiché -> (index utilisé, ordre décroissant)
+TRIS_LIVRES = {
+    "Titre": ("titre", False),
+    "Auteur": ("auteur", False),
+    "Popularité": ("nombre_emprunts", True),
+    "Retour prévu": ("date_retour_prevue", False),
+}
+
 class ApplicationTk:
     def __init__(self, root):
         self.root = root
         self.setup_window()
         self.biblio = Bibliotheque()
         self.biblio.charger_donnees()
+        if self.biblio.rapport_integrite:
+            print(f"Contrôle des prêts au chargement :\n{resumer(self.biblio.rapport_integrite)}")
+        # BIBLIO_TRACE=fichier.jsonl.gz enregistre les appels pour les rejouer avec cli.py rejouer
+        self.enregistreur = None
+        if os.environ.get("BIBLIO_TRACE"):
+            self.enregistreur = EnregistreurAppels(self.biblio, os.environ["BIBLIO_TRACE"])
+            self.biblio = self.enregistreur
+        self.sauvegarde = PlanificateurSauvegarde(
+            self.biblio, self.root.after,
+            rapporter=lambda anomalies: print(f"Contrôle des prêts à la sauvegarde :\n{resumer(anomalies)}"))
+        self.vignettes = ChargeurVignettes(CacheVignettes("vignettes"), self.root.after)
+        # Retards de la boucle Tk et gestionnaires de boutons trop lents, écrits dans lenteurs.log
+        self.surveillance = SurveillanceBoucle(self.root.after)
+        self.chrono = self.surveillance.envelopper
+        # Écrans construits une seule fois puis masqués/réaffichés
+        self.ecrans = {}
+        self.biblio.abonner(self.on_changement)
         self.setup_ui()
 
     def setup_window(self):
@@ -305,7 +130,7 @@ class ApplicationTk:
         for text, command in menu_items:
             btn = ctk.CTkButton(self.sidebar,
                                text=text,
-                               command=command,
+                               command=self.chrono(command),
                                font=("Arial", 14),
                                corner_radius=8,
                                fg_color="#3b82f6",
@@ -319,8 +144,52 @@ class ApplicationTk:
     # =============== METHODES D'AFFICHAGE ===============
 
     def clear_content(self):
+        """Masque les écrans en cache et détruit les autres"""
+        en_cache = {str(ecran) for ecran in self.ecrans.values()}
         for widget in self.main_content.winfo_children():
-            widget.destroy()
+            if str(widget) in en_cache:
+                widget.pack_forget()
+            else:
+                widget.destroy()
+
+    def afficher_ecran(self, nom):
+        """Réaffiche un écran déjà construit ; retourne False s'il reste à construire"""
+        self.clear_content()
+        ecran = self.ecrans.get(nom)
+        if ecran is None:
+            return False
+        ecran.pack(expand=True, fill="both", padx=20, pady=20)
+        return True
+
+    def nouvel_ecran(self, nom):
+        content = ctk.CTkFrame(self.main_content, fg_color="transparent")
+        content.pack(expand=True, fill="both", padx=20, pady=20)
+        self.ecrans[nom] = content
+        return content
+
+    def on_changement(self, evenement, cle):
+        """Met à jour uniquement les lignes et cartes touchées par une modification"""
+        if evenement == "recharge":
+            for ecran in self.ecrans.values():
+                ecran.destroy()
+            self.ecrans.clear()
+            return
+
+        if "accueil" in self.ecrans:
+            if evenement.startswith("livre_"):
+                self.rafraichir_accueil("Livres", "Disponibles")
+            elif evenement.startswith("utilisateur_"):
+                self.rafraichir_accueil("Utilisateurs", "Pénalités")
+
+        if "livres" in self.ecrans and evenement.startswith("livre_"):
+            self.changer_page_livres(self.page_livres)
+
+        if "utilisateurs" in self.ecrans:
+            if evenement == "utilisateur_ajoute":
+                self.ajouter_ligne_utilisateur(cle)
+            elif evenement == "utilisateur_modifie":
+                self.maj_ligne_utilisateur(cle)
+
     def show_parametres(self):
         self.clear_content()
         content = ctk.CTkFrame(self.main_content, fg_color="transparent")
@@ -342,46 +211,26 @@ class ApplicationTk:
 
         def valider():
             try:
-                self.biblio.duree_emprunt = int(entries["Durée emprunt (jours)"].get())
-                self.biblio.taux_penalite = float(entries["Taux pénalité (€/jour)"].get())
-                self.biblio.sauvegarder()
+                self.biblio.modifier_parametres(
+                    int(entries["Durée emprunt (jours)"].get()),
+                    float(entries["Taux pénalité (€/jour)"].get())
+                )
+                self.sauvegarde.signaler()
                 messagebox.showinfo("Succès", "Paramètres mis à jour!")
             except Exception as e:
                 messagebox.showerror("Erreur", f"Valeurs invalides: {str(e)}")
 
         ctk.CTkButton(form, 
                       text="Enregistrer les modifications", 
-                      command=valider,
+                      command=self.chrono(valider),
                       fg_color="#3b82f6",
                       hover_color="#2563eb").pack(pady=20)
 
 
     def show_welcome(self):
-        self.clear_content()
-        content = ctk.CTkFrame(self.main_content, fg_color="transparent")
-        content.pack(expand=True, fill="both", padx=20, pady=20)
-
-        ctk.CTkLabel(content, 
-                    text="Bienvenue dans votre Bibliothèque Digitale",
-                    font=("Arial", 24, "bold"),
-                    text_color="#1e293b").pack(pady=50)
-
-        stats = self.biblio.get_statistiques()
-        stats_text = (
-            f"📚 Livres total: {stats['total_livres']}\n"
-            f"📖 Disponibles: {stats['livres_disponibles']}\n"
-            f"👥 Utilisateurs: {stats['total_utilisateurs']}\n"
-            f"💰 Pénalités totales: {stats['penalites_total']}€"
-        )
-        
-        ctk.CTkLabel(content, 
-                    text=stats_text,
-                    font=("Arial", 18),
-                    text_color="#475569").pack()
-    def show_welcome(self):
-        self.clear_content()
-        content = ctk.CTkFrame(self.main_content, fg_color="transparent")
-        content.pack(expand=True, fill="both", padx=20, pady=20)
+        if self.afficher_ecran("accueil"):
+            return
+        content = self.nouvel_ecran("accueil")
 
         # Frame principale avec ombre et bordure arrondie
         welcome_frame = ctk.CTkFrame(content, 
@@ -417,13 +266,13 @@ class ApplicationTk:
         subtitle_label.pack(pady=(0, 40))
 
         # Statistiques dans des cartes modernes
-        stats = self.biblio.get_statistiques()
         stats_data = [
-            {"icon": "📚", "title": "Livres", "value": stats['total_livres'], "color": "#3b82f6"},
-            {"icon": "📖", "title": "Disponibles", "value": stats['livres_disponibles'], "color": "#10b981"},
-            {"icon": "👥", "title": "Utilisateurs", "value": stats['total_utilisateurs'], "color": "#8b5cf6"},
-            {"icon": "💰", "title": "Pénalités", "value": f"{stats['penalites_total']}€", "color": "#ef4444"}
+            {"icon": "📚", "title": "Livres", "color": "#3b82f6"},
+            {"icon": "📖", "title": "Disponibles", "color": "#10b981"},
+            {"icon": "👥", "title": "Utilisateurs", "color": "#8b5cf6"},
+            {"icon": "💰", "title": "Pénalités", "color": "#ef4444"}
         ]
+        self.cartes_accueil = {}
 
         stats_frame = ctk.CTkFrame(welcome_frame, fg_color="transparent")
         stats_frame.pack(pady=(0, 40))
@@ -444,10 +293,11 @@ class ApplicationTk:
             icon.pack(pady=(15, 5))
             
             value = ctk.CTkLabel(card,
-                                text=str(stat["value"]),
+                                text="",
                                 font=("Arial", 24, "bold"),
                                 text_color="white")
             value.pack()
+            self.cartes_accueil[stat["title"]] = value
             
             title = ctk.CTkLabel(card,
                                text=stat["title"],
@@ -477,7 +327,7 @@ class ApplicationTk:
         for text, command, color in quick_actions:
             btn = ctk.CTkButton(quick_actions_frame,
                                text=text,
-                               command=command,
+                               command=self.chrono(command),
                                font=("Arial", 14),
                                fg_color=color,
                                hover_color=f"{color}90",
@@ -493,10 +343,24 @@ class ApplicationTk:
                              text_color="#94a3b8")
         footer.pack(side="bottom", pady=20)
 
+        self.rafraichir_accueil()
+
+    def rafraichir_accueil(self, *titres):
+        """Met à jour les cartes demandées (toutes par défaut) à partir des compteurs de la bibliothèque"""
+        compteurs = self.biblio.compteurs()
+        valeurs = {
+            "Livres": compteurs['total_livres'],
+            "Disponibles": compteurs['livres_disponibles'],
+            "Utilisateurs": compteurs['total_utilisateurs'],
+            "Pénalités": f"{compteurs['penalites_total']}€"
+        }
+        for titre in titres or valeurs:
+            self.cartes_accueil[titre].configure(text=str(valeurs[titre]))
+
     def show_livres(self):
-        self.clear_content()
-        content = ctk.CTkFrame(self.main_content, fg_color="transparent")
-        content.pack(expand=True, fill="both", padx=20, pady=20)
+        if self.afficher_ecran("livres"):
+            return
+        content = self.nouvel_ecran("livres")
 
         # Header
         header = ctk.CTkFrame(content, fg_color="transparent")
@@ -505,26 +369,120 @@ class ApplicationTk:
                      text="Gestion des Livres", 
                      font=("Arial", 20, "bold")).pack(anchor="center")
 
-
-        # Liste
-        scroll_frame = ctk.CTkScrollableFrame(content, height=500)
-        scroll_frame.pack(fill="both", expand=True)
-
-        for isbn, livre in self.biblio.livres.items():
-            frame = ctk.CTkFrame(scroll_frame, corner_radius=8)
-            frame.pack(fill="x", pady=2, padx=5)
-            
-            status = "🟢" if livre.disponible else "🔴"
-            text = f"{status} {livre.titre} - {livre.auteur} ({isbn})"
-            ctk.CTkLabel(frame, 
-                         text=text,
-                         font=("Arial", 14)).pack(side="left", padx=10)
-            
-            if not livre.disponible:
-                user = self.biblio.utilisateurs[livre.emprunteur]
-                ctk.CTkLabel(frame, 
-                            text=f"Emprunté par: {user.nom}",
-                            text_color="#64748b").pack(side="right", padx=10)
+        # Tri, filtre et pagination
+        options = ctk.CTkFrame(content, fg_color="transparent")
+        options.pack(fill="x", pady=5)
+
+        self.tri_livres = tk.StringVar(value="Titre")
+        ctk.CTkOptionMenu(options,
+                          variable=self.tri_livres,
+                          values=list(TRIS_LIVRES),
+                          command=self.chrono(lambda _: self.changer_page_livres(0), "tri_livres")).pack(side="left", padx=5)
+
+        self.filtre_disponibles = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(options,
+                        text="Disponibles seulement",
+                        variable=self.filtre_disponibles,
+                        command=self.chrono(lambda: self.changer_page_livres(0), "filtre_disponibles")).pack(side="left", padx=10)
+
+        ctk.CTkButton(options, text="▶", width=40,
+                      command=self.chrono(lambda: self.changer_page_livres(self.page_livres + 1),
+                                          "page_suivante")).pack(side="right", padx=5)
+        self.label_page_livres = ctk.CTkLabel(options, text="")
+        self.label_page_livres.pack(side="right", padx=5)
+        ctk.CTkButton(options, text="◀", width=40,
+                      command=self.chrono(lambda: self.changer_page_livres(self.page_livres - 1),
+                                          "page_precedente")).pack(side="right", padx=5)
+
+        # Liste : un nombre fixe de lignes réutilisées d'une page à l'autre
+        self.liste_livres = ctk.CTkScrollableFrame(content, height=500)
+        self.liste_livres.pack(fill="both", expand=True)
+
+        # Les couvertures sont chargées en arrière-plan, un aplat les remplace en attendant
+        self.vignette_attente = ctk.CTkImage(light_image=Image.new("RGB", TAILLE_VIGNETTE, "#e2e8f0"),
+                                             size=TAILLE_VIGNETTE)
+
+        self.lignes_livres = []
+        for _ in range(TAILLE_PAGE_LIVRES):
+            frame = ctk.CTkFrame(self.liste_livres, corner_radius=8)
+            vignette = ctk.CTkLabel(frame, text="", image=self.vignette_attente)
+            vignette.pack(side="left", padx=(10, 0), pady=4)
+            titre = ctk.CTkLabel(frame, text="", font=("Arial", 14))
+            titre.pack(side="left", padx=10)
+            emprunteur = ctk.CTkLabel(frame, text="", text_color="#64748b")
+            emprunteur.pack(side="right", padx=10)
+            self.lignes_livres.append({"frame": frame, "vignette": vignette, "titre": titre,
+                                       "emprunteur": emprunteur, "textes": None, "couverture": None})
+
+        self.changer_page_livres(0)
+
+    def changer_page_livres(self, page):
+        critere, _ = TRIS_LIVRES[self.tri_livres.get()]
+        total = self.biblio.compter_livres(critere, self.filtre_disponibles.get())
+        nb_pages = max(1, -(-total // TAILLE_PAGE_LIVRES))
+        self.page_livres = min(max(page, 0), nb_pages - 1)
+        self.label_page_livres.configure(text=f"Page {self.page_livres + 1}/{nb_pages}")
+        self.afficher_page_livres()
+
+    def afficher_page_livres(self):
+        """Affiche la page courante en ne reconfigurant que les lignes qui ont changé"""
+        critere, decroissant = TRIS_LIVRES[self.tri_livres.get()]
+        livres = self.biblio.livres_tries(critere,
+                                          page=self.page_livres,
+                                          taille=TAILLE_PAGE_LIVRES,
+                                          disponibles=self.filtre_disponibles.get(),
+                                          decroissant=decroissant)
+
+        # Seules les couvertures de la page affichée sont décodées
+        self.vignettes.garder(livre.couverture for livre in livres if livre.couverture)
+
+        for i, ligne in enumerate(self.lignes_livres):
+            textes = self.textes_ligne_livre(livres[i]) if i < len(livres) else None
+            if i < len(livres):
+                self.afficher_couverture(ligne, livres[i].couverture)
+            if textes == ligne["textes"]:
+                continue
+            ligne["textes"] = textes
+            if textes is None:
+                ligne["frame"].pack_forget()
+                # Une ligne masquée ne garde pas sa couverture : sa demande peut être abandonnée
+                ligne["couverture"] = None
+                continue
+            ligne["titre"].configure(text=textes[0])
+            ligne["emprunteur"].configure(text=textes[1])
+            ligne["frame"].pack(fill="x", pady=2, padx=5)
+
+    def afficher_couverture(self, ligne, chemin):
+        if chemin == ligne["couverture"]:
+            return
+        ligne["couverture"] = chemin
+        ligne["vignette"].configure(image=self.vignette_attente)
+        if chemin:
+            self.vignettes.demander(chemin, lambda image: self.poser_vignette(ligne, chemin, image),
+                                    lambda: self.oublier_vignette(ligne, chemin))
+
+    def oublier_vignette(self, ligne, chemin):
+        # Demande abandonnée : la couverture sera redemandée au prochain affichage du livre
+        if ligne["couverture"] == chemin:
+            ligne["couverture"] = None
+
+    def poser_vignette(self, ligne, chemin, image):
+        # La ligne a pu passer à un autre livre pendant le décodage
+        if image is None or ligne["couverture"] != chemin:
+            return
+        ligne["vignette"].configure(image=ctk.CTkImage(light_image=image, size=image.size))
+
+    def textes_ligne_livre(self, livre):
+        status = "🟢" if livre.disponible else "🔴"
+        emprunteur = ""
+        mise = self.biblio.reservations.mise_de_cote(livre.isbn) if livre.disponible else None
+        if mise:
+            status = "🟡"
+            emprunteur = f"Mis de côté pour: {mise[0]} jusqu'au {mise[1].strftime('%d/%m/%Y')}"
+        if not livre.disponible:
+            user = self.biblio.utilisateurs.get(livre.emprunteur)
+            emprunteur = f"Emprunté par: {user.nom if user else f'utilisateur inconnu ({livre.emprunteur})'}"
+        return (f"{status} {livre.titre} - {livre.auteur} ({livre.isbn})", emprunteur)
 
     def show_ajouter_livre(self):
         self.clear_content()
@@ -535,7 +493,7 @@ class ApplicationTk:
         form.pack(expand=True)
 
         entries = {}
-        fields = [("Titre", 300), ("Auteur", 300), ("ISBN", 200)]
+        fields = [("Titre", 300), ("Auteur", 300), ("ISBN", 200), ("Couverture", 300)]
         
         for field, width in fields:
             frame = ctk.CTkFrame(form, fg_color="transparent")
@@ -551,8 +509,10 @@ class ApplicationTk:
                     auteur=entries["Auteur"].get(),
                     isbn=entries["ISBN"].get()
                 )
+                # Chemin d'une image, facultatif
+                livre.couverture = entries["Couverture"].get().strip() or None
                 if self.biblio.ajouter_livre(livre):
-                    self.biblio.sauvegarder()
+                    self.sauvegarde.signaler()
                     messagebox.showinfo("Succès", "Livre ajouté avec succès!")
                     self.show_livres()
                 else:
@@ -562,14 +522,14 @@ class ApplicationTk:
 
         ctk.CTkButton(form, 
                       text="Valider l'ajout", 
-                      command=valider,
+                      command=self.chrono(valider),
                       fg_color="#10b981",
                       hover_color="#059669").pack(pady=20,anchor="e",padx=80)
 
     def show_utilisateurs(self):
-        self.clear_content()
-        content = ctk.CTkFrame(self.main_content, fg_color="transparent")
-        content.pack(expand=True, fill="both", padx=20, pady=20)
+        if self.afficher_ecran("utilisateurs"):
+            return
+        content = self.nouvel_ecran("utilisateurs")
 
         # Header
         header = ctk.CTkFrame(content, fg_color="transparent")
@@ -580,24 +540,36 @@ class ApplicationTk:
 
         ctk.CTkButton(header, 
                       text="➕ Ajouter Utilisateur", 
-                      command=self.show_ajouter_utilisateur,
+                      command=self.chrono(self.show_ajouter_utilisateur),
                       width=120).pack(side="right", padx=10)
 
         # Liste
-        scroll_frame = ctk.CTkScrollableFrame(content, height=500)
-        scroll_frame.pack(fill="both", expand=True)
+        self.liste_utilisateurs = ctk.CTkScrollableFrame(content, height=500)
+        self.liste_utilisateurs.pack(fill="both", expand=True)
 
-        for user_id, user in self.biblio.utilisateurs.items():
-            frame = ctk.CTkFrame(scroll_frame, corner_radius=8)
-            frame.pack(fill="x", pady=2, padx=5)
-            
-            ctk.CTkLabel(frame, 
-                         text=f"👤 {user.nom} ({user_id})",
-                         font=("Arial", 14)).pack(side="left", padx=10)
-            
-            ctk.CTkLabel(frame, 
-                         text=f"📚 {len(user.livres_empruntes)} emprunts | 💰 {user.penalites}€",
-                         text_color="#64748b").pack(side="right", padx=10)
+        self.lignes_utilisateurs = {}
+        for user_id in self.biblio.utilisateurs:
+            self.ajouter_ligne_utilisateur(user_id)
+
+    def ajouter_ligne_utilisateur(self, user_id):
+        user = self.biblio.utilisateurs[user_id]
+        frame = ctk.CTkFrame(self.liste_utilisateurs, corner_radius=8)
+        frame.pack(fill="x", pady=2, padx=5)
+        
+        ctk.CTkLabel(frame, 
+                     text=f"👤 {user.nom} ({user_id})",
+                     font=("Arial", 14)).pack(side="left", padx=10)
+        
+        compteurs = ctk.CTkLabel(frame, text_color="#64748b")
+        compteurs.pack(side="right", padx=10)
+
+        self.lignes_utilisateurs[user_id] = compteurs
+        self.maj_ligne_utilisateur(user_id)
+
+    def maj_ligne_utilisateur(self, user_id):
+        user = self.biblio.utilisateurs[user_id]
+        self.lignes_utilisateurs[user_id].configure(
+            text=f"📚 {len(user.livres_empruntes)} emprunts | 💰 {user.penalites}€")
 
     def show_ajouter_utilisateur(self):
         self.clear_content()
@@ -608,7 +580,7 @@ class ApplicationTk:
         form.pack(expand=True)
 
         entries = {}
-        fields = [("Nom complet", 300), ("ID Utilisateur", 200)]
+        fields = [("Nom complet", 300), ("ID Utilisateur", 200), ("Email", 300)]
         
         for field, width in fields:
             frame = ctk.CTkFrame(form, fg_color="transparent")
@@ -621,10 +593,11 @@ class ApplicationTk:
             try:
                 user = Utilisateur(
                     nom=entries["Nom complet"].get(),
-                    id_utilisateur=entries["ID Utilisateur"].get()
+                    id_utilisateur=entries["ID Utilisateur"].get(),
+                    email=entries["Email"].get() or None
                 )
                 if self.biblio.ajouter_utilisateur(user):
-                    self.biblio.sauvegarder()
+                    self.sauvegarde.signaler()
                     messagebox.showinfo("Succès", "Utilisateur ajouté avec succès!")
                     self.show_utilisateurs()
                 else:
@@ -634,7 +607,7 @@ class ApplicationTk:
 
         ctk.CTkButton(form, 
                       text="Valider l'ajout", 
-                      command=valider,
+                      command=self.chrono(valider),
                       fg_color="#10b981",
                       hover_color="#059669").pack(pady=20,anchor="e",padx=80)
 
@@ -677,7 +650,7 @@ class ApplicationTk:
                     texte = f"{livre.titre} - {livre.auteur} (ISBN: {livre.isbn}) - {dispo}"
                     ctk.CTkLabel(resultats_frame, text=texte, anchor="w").pack(fill="x", padx=10, pady=2)
 
-        bouton_recherche = ctk.CTkButton(content, text="Rechercher", command=lancer_recherche)
+        bouton_recherche = ctk.CTkButton(content, text="Rechercher", command=self.chrono(lancer_recherche))
         bouton_recherche.pack(pady=5)
 
     def afficher_livres_disponibles(self):
@@ -765,9 +738,16 @@ class ApplicationTk:
                 isbn = entries["ISBN Livre"].get()
                 
                 if self.biblio.emprunter_livre(isbn, id_user):
-                    self.biblio.sauvegarder()
+                    self.sauvegarde.signaler()
                     messagebox.showinfo("Succès", "Emprunt enregistré!")
                     self.show_emprunt()
+                elif (isbn in self.biblio.livres and id_user in self.biblio.utilisateurs
+                      and messagebox.askyesno("Livre indisponible", "Ce livre n'est pas disponible. Le réserver ?")):
+                    if self.biblio.reserver(isbn, id_user):
+                        self.sauvegarde.signaler()
+                        messagebox.showinfo("Succès", "Réservation enregistrée : le livre sera mis de côté à son retour.")
+                    else:
+                        messagebox.showerror("Erreur", "Réservation impossible (déjà réservé ou limite atteinte)!")
                 else:
                     messagebox.showerror("Erreur", "Emprunt impossible!")
             except Exception as e:
@@ -775,7 +755,7 @@ class ApplicationTk:
 
         ctk.CTkButton(form, 
                       text="Valider l'emprunt", 
-                      command=valider,
+                      command=self.chrono(valider),
                       fg_color="#3b82f6",
                       hover_color="#2563eb").pack(pady=20,anchor="e",padx=30)
 
@@ -802,8 +782,13 @@ class ApplicationTk:
                 isbn = entries["ISBN Livre"].get()
                 
                 if self.biblio.retourner_livre(isbn):
-                    self.biblio.sauvegarder()
-                    messagebox.showinfo("Succès", "Retour enregistré!")
+                    self.sauvegarde.signaler()
+                    mise = self.biblio.reservations.mise_de_cote(isbn)
+                    if mise:
+                        messagebox.showinfo("Succès", f"Retour enregistré! Livre à mettre de côté pour "
+                                                      f"{mise[0]} jusqu'au {mise[1].strftime('%d/%m/%Y')}.")
+                    else:
+                        messagebox.showinfo("Succès", "Retour enregistré!")
                     self.show_retour()
                 else:
                     messagebox.showerror("Erreur", "Retour impossible!")
@@ -812,7 +797,7 @@ class ApplicationTk:
 
         ctk.CTkButton(form, 
                       text="Valider le retour", 
-                      command=valider,
+                      command=self.chrono(valider),
                       fg_color="#3b82f6",
                       hover_color="#2563eb").pack(pady=20,anchor="e",padx=30)
 
@@ -889,11 +874,15 @@ class ApplicationTk:
         self.y = event.y
     def exit_app(self):
        if messagebox.askokcancel("Quitter", "Voulez-vous vraiment quitter l'application ?"):
+        self.sauvegarde.vider()
+        self.vignettes.fermer()
+        if self.enregistreur:
+            self.enregistreur.fermer()
         self.root.destroy()
 
     def sauvegarder_donnees(self):
-        """Sauvegarde les données de la bibliothèque"""
-        self.biblio.sauvegarder()
+        """Écrit immédiatement les modifications en attente"""
+        self.sauvegarde.vider()
         messagebox.showinfo("Sauvegarde", "Les données ont été sauvegardées avec succès!")
 
     def move_window(self, event):
@@ -935,6 +924,7 @@ class ApplicationTk:
                 
                 message = self.biblio.supprimer_livre(isbn)
                 if "succès" in message:
+                    self.sauvegarde.signaler()
                     messagebox.showinfo("Succès", message)
                     self.supprimer_livre()  # Réinitialiser le formulaire
                 else:
@@ -944,7 +934,7 @@ class ApplicationTk:
 
         ctk.CTkButton(form, 
                  text="Supprimer le livre", 
-                 command=valider,
+                 command=self.chrono(valider),
                  fg_color="#3b82f6",
                  hover_color="#2563eb").pack(pady=20, anchor="e", padx=30)
 
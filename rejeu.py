@@ -0,0 +1,253 @@
+"""Enregistrement et rejeu de la charge réelle d'un poste de prêt.
+
+EnregistreurAppels s'intercale entre ApplicationTk et la Bibliotheque et écrit
+chaque appel public (instant, méthode, arguments) dans une trace gzip au
+format JSON lines. La première ligne contient l'état initial, la dernière
+l'empreinte de l'état final.
+
+rejouer() relance une trace contre le seul noyau métier, accélérée et
+répartie sur plusieurs guichets simulés, puis mesure débit, latences et
+compare l'état final à celui de l'enregistrement.
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from bibliotheque import Bibliotheque, Critere, Et, Livre, Ou, Utilisateur
+from catalogue import LivresCatalogue
+
+# Les appels d'entrée/sortie et d'abonnement ne font pas partie de la charge rejouée
+METHODES_ENREGISTREES = {
+    "ajouter_livre", "supprimer_livre", "ajouter_utilisateur",
+    "emprunter_livre", "retourner_livre", "modifier_parametres", "definir_couverture",
+    "reserver", "annuler_reservation",
+    "rechercher_livre", "requete", "expliquer",
+    "livres_tries", "compter_livres", "afficher_livres_disponibles",
+    "verifier_retards", "get_statistiques", "compteurs",
+}
+
+# Une trace coupée (processus tué) reste lisible jusqu'au dernier point de synchronisation gzip
+LIGNES_PAR_SYNCHRO = 500
+SECONDES_PAR_SYNCHRO = 2.0
+
+# ===================================================
+# ENCODAGE DES ARGUMENTS
+# ===================================================
+
+def _encoder(valeur):
+    if isinstance(valeur, Livre):
+        return {"Livre": [valeur.titre, valeur.auteur, valeur.isbn, valeur.couverture]}
+    if isinstance(valeur, Utilisateur):
+        return {"Utilisateur": [valeur.nom, valeur.id_utilisateur, valeur.email]}
+    if isinstance(valeur, Critere):
+        return {"Critere": [valeur.champ, valeur.operateur, _encoder(valeur.valeur)]}
+    if isinstance(valeur, (Et, Ou)):
+        return {type(valeur).__name__: [_encoder(c) for c in valeur.criteres]}
+    if isinstance(valeur, datetime):
+        return {"datetime": valeur.isoformat()}
+    if isinstance(valeur, tuple):
+        return {"tuple": [_encoder(v) for v in valeur]}
+    return valeur
+
+def _decoder(valeur):
+    if not isinstance(valeur, dict):
+        return valeur
+    (type_, contenu), = valeur.items()
+    if type_ == "Livre":
+        livre = Livre(*contenu[:3])
+        livre.couverture = contenu[3] if len(contenu) > 3 else None
+        return livre
+    if type_ == "Utilisateur":
+        return Utilisateur(*contenu)
+    if type_ == "Critere":
+        return Critere(contenu[0], contenu[1], _decoder(contenu[2]))
+    if type_ == "Et":
+        return Et(*[_decoder(c) for c in contenu])
+    if type_ == "Ou":
+        return Ou(*[_decoder(c) for c in contenu])
+    if type_ == "datetime":
+        return datetime.fromisoformat(contenu)
+    return tuple(_decoder(v) for v in contenu)
+
+def empreinte_etat(biblio):
+    """Empreinte des prêts, du catalogue et des utilisateurs.
+
+    Les dates et les pénalités dépendent de l'heure d'exécution et sont exclues.
+    """
+    etat = {
+        "livres": sorted((isbn, l.titre, l.auteur, l.disponible, l.emprunteur, l.nombre_emprunts)
+                         for isbn, l in biblio.livres.items()),
+        "utilisateurs": sorted((id_user, u.nom, u.livres_empruntes, u.historique_emprunts)
+                               for id_user, u in biblio.utilisateurs.items()),
+        "parametres": [biblio.duree_emprunt, biblio.taux_penalite],
+    }
+    return hashlib.sha256(json.dumps(etat).encode("utf-8")).hexdigest()
+
+def empreinte_fichier(chemin):
+    """Empreinte sha256 du contenu, lu par blocs"""
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 16), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+# ===================================================
+# ENREGISTREMENT
+# ===================================================
+
+class EnregistreurAppels:
+    """Se comporte comme la Bibliotheque enveloppée et trace ses appels publics"""
+
+    def __init__(self, biblio, fichier):
+        self._biblio = biblio
+        self._flux = gzip.open(fichier, "wt", encoding="utf-8")
+        self._verrou = threading.Lock()
+        self._debut = time.perf_counter()
+        self._non_synchronisees = 0
+        self._derniere_synchro = self._debut
+        entete = {
+            "version": 1,
+            "debut": datetime.now().isoformat(),
+            "etat_initial": json.loads(biblio.contenu_json()),
+        }
+        # Avec un catalogue, l'état initial ne contient que la surcouche : la trace désigne
+        # le catalogue par un chemin absolu et son empreinte, pour rejouer depuis un autre dossier
+        if isinstance(biblio.livres, LivresCatalogue):
+            chemin = os.path.abspath(biblio.livres.catalogue.fichier)
+            entete["etat_initial"]["catalogue"] = chemin
+            entete["empreinte_catalogue"] = empreinte_fichier(chemin)
+        self._ecrire(entete)
+
+    def _ecrire(self, ligne):
+        with self._verrou:
+            self._flux.write(json.dumps(ligne, separators=(",", ":"), ensure_ascii=False) + "\n")
+            self._non_synchronisees += 1
+            maintenant = time.perf_counter()
+            if (self._non_synchronisees >= LIGNES_PAR_SYNCHRO
+                    or maintenant - self._derniere_synchro >= SECONDES_PAR_SYNCHRO):
+                # Vide le tampon texte et écrit un point de synchronisation gzip (Z_SYNC_FLUSH)
+                self._flux.flush()
+                self._non_synchronisees = 0
+                self._derniere_synchro = maintenant
+
+    def __getattr__(self, nom):
+        attribut = getattr(self._biblio, nom)
+        if nom not in METHODES_ENREGISTREES:
+            return attribut
+
+        def appel(*args, **kwargs):
+            instant = round(time.perf_counter() - self._debut, 4)
+            self._ecrire([instant, nom, [_encoder(a) for a in args],
+                          {cle: _encoder(v) for cle, v in kwargs.items()}])
+            return attribut(*args, **kwargs)
+        return appel
+
+    def fermer(self):
+        self._ecrire({"fin": empreinte_etat(self._biblio)})
+        with self._verrou:
+            self._flux.close()
+
+# ===================================================
+# REJEU
+# ===================================================
+
+def lire_trace(fichier):
+    """Retourne (entête, appels, empreinte finale ou None si la trace est incomplète).
+
+    Une trace coupée est lue jusqu'à sa dernière ligne complète ; ValueError si elle n'a pas d'entête.
+    """
+    entete, appels, fin = None, [], None
+    with gzip.open(fichier, "rt", encoding="utf-8") as f:
+        try:
+            for ligne in f:
+                if not ligne.endswith("\n"):
+                    break
+                donnee = json.loads(ligne)
+                if entete is None:
+                    entete = donnee
+                elif isinstance(donnee, dict):
+                    fin = donnee["fin"]
+                else:
+                    appels.append(donnee)
+        except EOFError:
+            # Flux gzip interrompu : l'enregistreur n'a pas été fermé
+            pass
+    if not isinstance(entete, dict) or "etat_initial" not in entete:
+        raise ValueError(f"{fichier} : trace sans entête, rien à rejouer")
+    return entete, appels, fin
+
+def _centile(valeurs_triees, centile):
+    if not valeurs_triees:
+        return 0.0
+    rang = min(len(valeurs_triees) - 1, int(len(valeurs_triees) * centile / 100))
+    return valeurs_triees[rang]
+
+def rejouer(fichier, vitesse=1.0, guichets=1):
+    """Rejoue une trace ; vitesse 10 = dix fois plus vite que l'original, 0 = sans attente.
+
+    Les guichets se partagent les appels dans l'ordre de la trace ; le noyau
+    n'étant pas thread-safe, chaque appel est exécuté sous un verrou, comme
+    dans la boucle Tk. Un ordre d'exécution différent de l'original se voit
+    dans etat_equivalent.
+    """
+    entete, appels, fin = lire_trace(fichier)
+    catalogue = entete["etat_initial"].get("catalogue")
+    if catalogue and entete.get("empreinte_catalogue") != empreinte_fichier(catalogue):
+        raise ValueError(f"Le catalogue {catalogue} a changé depuis l'enregistrement de la trace")
+    biblio = Bibliotheque()
+    biblio.importer(entete["etat_initial"])
+    appels = [(instant, nom, [_decoder(a) for a in args], {cle: _decoder(v) for cle, v in kwargs.items()})
+              for instant, nom, args, kwargs in appels]
+
+    file = queue.Queue()
+    verrou = threading.Lock()
+    latences = []
+    erreurs = []
+
+    def guichet():
+        while True:
+            appel = file.get()
+            if appel is None:
+                return
+            echeance, nom, args, kwargs = appel
+            with verrou:
+                try:
+                    getattr(biblio, nom)(*args, **kwargs)
+                except Exception as e:
+                    erreurs.append((nom, repr(e)))
+            latences.append(time.perf_counter() - echeance)
+
+    threads = [threading.Thread(target=guichet, daemon=True) for _ in range(guichets)]
+    for thread in threads:
+        thread.start()
+
+    depart = time.perf_counter()
+    for instant, nom, args, kwargs in appels:
+        echeance = depart + instant / vitesse if vitesse else time.perf_counter()
+        attente = echeance - time.perf_counter()
+        if attente > 0:
+            time.sleep(attente)
+        file.put((echeance, nom, args, kwargs))
+    for _ in threads:
+        file.put(None)
+    for thread in threads:
+        thread.join()
+    duree = time.perf_counter() - depart
+
+    latences.sort()
+    return {
+        "appels": len(appels),
+        "erreurs": len(erreurs),
+        "duree": duree,
+        "debit": len(appels) / duree if duree else 0.0,
+        "latence_p50_ms": _centile(latences, 50) * 1000,
+        "latence_p95_ms": _centile(latences, 95) * 1000,
+        "latence_p99_ms": _centile(latences, 99) * 1000,
+        "latence_max_ms": (latences[-1] if latences else 0.0) * 1000,
+        "etat_equivalent": None if fin is None else empreinte_etat(biblio) == fin,
+    }
@@ -0,0 +1,199 @@
+"""Relances par email des emprunteurs en retard.
+
+Les livres en retard sont regroupés par emprunteur (un seul message chacun)
+puis envoyés à travers un petit pool de connexions SMTP réutilisées, avec un
+débit maximal. Chaque envoi réussi est inscrit dans un journal : relancer la
+même campagne après une interruption reprend là où elle s'était arrêtée
+sans renvoyer de doublons.
+"""
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.message import EmailMessage
+
+# ===================================================
+# PRÉPARATION DES MESSAGES
+# ===================================================
+
+def regrouper_retards(biblio, maintenant=None):
+    """Retourne {id_utilisateur: [livres en retard]} à partir de l'index des dates de retour"""
+    maintenant = maintenant or datetime.now()
+    retards = {}
+    for livre in biblio.livres_tries("date_retour_prevue", fin=maintenant):
+        retards.setdefault(livre.emprunteur, []).append(livre)
+    return retards
+
+def cle_relance(campagne, id_user, livres):
+    """Identifiant stable d'un message : même campagne, même emprunteur, mêmes prêts"""
+    prets = ",".join(sorted(f"{livre.isbn}@{livre.date_retour_prevue.isoformat()}" for livre in livres))
+    return f"{campagne}|{id_user}|{prets}"
+
+def composer_message(user, livres, expediteur, maintenant=None):
+    maintenant = maintenant or datetime.now()
+    lignes = [f"Bonjour {user.nom},", "", "Les livres suivants auraient dû être rendus :", ""]
+    for livre in livres:
+        jours = (maintenant - livre.date_retour_prevue).days
+        lignes.append(f"- {livre.titre} ({livre.auteur}), retour prévu le "
+                      f"{livre.date_retour_prevue.strftime('%d/%m/%Y')} ({jours} jour(s) de retard)")
+    lignes += ["", "Merci de les rapporter au plus vite.", "", "La Bibliothèque Digitale"]
+
+    message = EmailMessage()
+    message["From"] = expediteur
+    message["To"] = user.email
+    message["Subject"] = f"Rappel : {len(livres)} livre(s) en retard"
+    message.set_content("\n".join(lignes))
+    return message
+
+# ===================================================
+# ENVOI
+# ===================================================
+
+class LimiteurDebit:
+    """Espace les envois pour ne pas dépasser un nombre de messages par seconde"""
+
+    def __init__(self, par_seconde):
+        self.intervalle = 1 / par_seconde if par_seconde else 0
+        self.prochain = time.monotonic()
+        self.verrou = threading.Lock()
+
+    def attendre(self):
+        if not self.intervalle:
+            return
+        with self.verrou:
+            maintenant = time.monotonic()
+            depart = max(self.prochain, maintenant)
+            self.prochain = depart + self.intervalle
+        if depart > maintenant:
+            time.sleep(depart - maintenant)
+
+class PoolSMTP:
+    """Connexions SMTP ouvertes à la demande puis réutilisées d'un message à l'autre"""
+
+    def __init__(self, hote, port=25, taille=4, debit=None, utilisateur=None, mot_de_passe=None,
+                 starttls=False, delai=30):
+        self.hote = hote
+        self.port = port
+        self.utilisateur = utilisateur
+        self.mot_de_passe = mot_de_passe
+        self.starttls = starttls
+        self.delai = delai
+        self.limiteur = LimiteurDebit(debit)
+        self.libres = queue.LifoQueue()
+        self.places = threading.Semaphore(taille)
+        self.taille = taille
+
+    def _connecter(self):
+        smtp = smtplib.SMTP(self.hote, self.port, timeout=self.delai)
+        if self.starttls:
+            smtp.starttls()
+        if self.utilisateur:
+            smtp.login(self.utilisateur, self.mot_de_passe)
+        return smtp
+
+    def envoyer(self, message):
+        self.limiteur.attendre()
+        with self.places:
+            try:
+                smtp = self.libres.get_nowait()
+            except queue.Empty:
+                smtp = self._connecter()
+            try:
+                smtp.send_message(message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Connexion fermée par le serveur pendant l'inactivité : une seule nouvelle tentative
+                smtp.close()
+                smtp = self._connecter()
+                try:
+                    smtp.send_message(message)
+                except Exception:
+                    smtp.close()
+                    raise
+            except Exception:
+                smtp.close()
+                raise
+            self.libres.put(smtp)
+
+    def fermer(self):
+        while True:
+            try:
+                smtp = self.libres.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                smtp.quit()
+            except smtplib.SMTPException:
+                smtp.close()
+
+class JournalEnvois:
+    """Fichier des messages déjà envoyés, une clé par ligne"""
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+        self.envoyes = set()
+        if os.path.exists(fichier):
+            with open(fichier, "r", encoding="utf-8") as f:
+                self.envoyes = {ligne.rstrip("\n") for ligne in f if ligne.strip()}
+        self.flux = open(fichier, "a", encoding="utf-8")
+        self.verrou = threading.Lock()
+
+    def __contains__(self, cle):
+        return cle in self.envoyes
+
+    def enregistrer(self, cle):
+        with self.verrou:
+            self.envoyes.add(cle)
+            self.flux.write(cle + "\n")
+            self.flux.flush()
+
+    def fermer(self):
+        with self.verrou:
+            self.flux.flush()
+            os.fsync(self.flux.fileno())
+            self.flux.close()
+
+class RelanceRetards:
+    """Envoie une relance par emprunteur en retard, sans doublon d'une exécution à l'autre"""
+
+    def __init__(self, biblio, pool, journal, expediteur, campagne=None):
+        self.biblio = biblio
+        self.pool = pool
+        self.journal = journal
+        self.expediteur = expediteur
+        self.campagne = campagne or datetime.now().date().isoformat()
+
+    def executer(self, maintenant=None):
+        """Retourne un bilan {envoyes, deja_envoyes, sans_email, echecs}"""
+        maintenant = maintenant or datetime.now()
+        bilan = {"envoyes": 0, "deja_envoyes": 0, "sans_email": 0, "echecs": 0}
+        a_envoyer = []
+
+        for id_user, livres in regrouper_retards(self.biblio, maintenant).items():
+            user = self.biblio.utilisateurs.get(id_user)
+            if user is None or not user.email:
+                bilan["sans_email"] += 1
+                continue
+            cle = cle_relance(self.campagne, id_user, livres)
+            if cle in self.journal:
+                bilan["deja_envoyes"] += 1
+                continue
+            a_envoyer.append((cle, composer_message(user, livres, self.expediteur, maintenant)))
+
+        def envoyer(cle, message):
+            try:
+                self.pool.envoyer(message)
+            except (smtplib.SMTPException, OSError) as e:
+                return cle, e
+            self.journal.enregistrer(cle)
+            return cle, None
+
+        with ThreadPoolExecutor(max_workers=self.pool.taille) as executeur:
+            for cle, erreur in executeur.map(lambda envoi: envoyer(*envoi), a_envoyer):
+                if erreur is None:
+                    bilan["envoyes"] += 1
+                else:
+                    bilan["echecs"] += 1
+        return bilan
@@ -0,0 +1,175 @@
+"""Synchronisation entre bibliothèques de différentes antennes.
+
+Chaque antenne tire le fil des changements des autres (changements_depuis)
+et applique les enregistrements reçus. Les conflits sont résolus par des
+règles qui ne dépendent pas de l'antenne qui les applique, si bien que deux
+antennes qui se synchronisent dans les deux sens convergent vers le même état.
+
+Les numéros de changement servent d'horloge de Lamport : appliquer un
+changement reçu fait passer la séquence locale au-delà de son numéro, donc
+tout ce qui se produit ensuite localement porte un numéro plus grand.
+
+Règles :
+- livre supprimé d'un côté, présent de l'autre : le changement de plus grand
+  numéro l'emporte, la suppression à égalité (un livre ré-ajouté après une
+  suppression reçue revient donc partout) ;
+- livre présent des deux côtés : l'état le plus avancé dans la vie du livre
+  (chaque emprunt puis chaque retour le fait avancer) ; à égalité, l'emprunt
+  le plus ancien, puis le plus petit identifiant d'emprunteur ;
+- utilisateur : l'historique est l'union des emprunts [isbn, date] des deux
+  côtés, les pénalités la somme des retards [isbn, date, montant] de l'union :
+  un emprunt ou un retard noté sur une seule antenne n'est jamais perdu ;
+  livres_empruntes est recalculé à partir de l'état local des livres ;
+- paramètres : la dernière valeur reçue.
+
+Quand l'état local l'emporte sur un état reçu, il est republié dans le fil
+local afin que l'autre antenne le reçoive à son tour.
+"""
+import json
+
+from bibliotheque import livre_depuis_dict, utilisateur_depuis_dict
+
+def rang_pret(etat):
+    """Avancement d'un livre : 2n pour n emprunts terminés, 2n - 1 pendant le n-ième emprunt"""
+    return 2 * etat["nombre_emprunts"] - (0 if etat["disponible"] else 1)
+
+def fusionner_livre(local, distant):
+    if rang_pret(local) != rang_pret(distant):
+        return local if rang_pret(local) > rang_pret(distant) else distant
+    return min(local, distant, key=lambda etat: (etat["date_emprunt"] or "",
+                                                 etat["emprunteur"] or "",
+                                                 json.dumps(etat, sort_keys=True)))
+
+def fusionner_historiques(local, distant):
+    """Union des emprunts [isbn, date], par date ; les isbn seuls (fichiers anciens) forment un préfixe commun"""
+    anciens = max(([e for e in h if isinstance(e, str)] for h in (local, distant)),
+                  key=lambda h: (len(h), h))
+    emprunts = {tuple(e) for h in (local, distant) for e in h if not isinstance(e, str)}
+    return anciens + [list(e) for e in sorted(emprunts, key=lambda e: (e[1], e[0]))]
+
+def _total_retards(retards):
+    return sum(montant for _, _, montant in retards)
+
+def fusionner_penalites(local, distant):
+    """Retourne (pénalités, retards) : chaque retard compte une fois, quelle que soit l'antenne qui l'a noté.
+
+    Les pénalités antérieures au détail des retards (fichiers anciens) forment une base commune.
+    """
+    montants = {}
+    for etat in (local, distant):
+        for isbn, date, montant in etat.get("retards", ()):
+            montants[(isbn, date)] = max(montant, montants.get((isbn, date), montant))
+    retards = [[isbn, date, montants[(isbn, date)]]
+               for isbn, date in sorted(montants, key=lambda cle: (cle[1] or "", cle[0]))]
+    base = max(round(etat["penalites"] - _total_retards(etat.get("retards", ())), 2) for etat in (local, distant))
+    return round(base + _total_retards(retards), 2), retards
+
+def fusionner_utilisateur(local, distant):
+    fusion = dict(local)
+    fusion["nom"] = max(local["nom"], distant["nom"])
+    email = local.get("email") or distant.get("email")
+    if email:
+        fusion["email"] = email
+    fusion["penalites"], retards = fusionner_penalites(local, distant)
+    fusion.pop("retards", None)
+    if retards:
+        fusion["retards"] = retards
+    fusion["historique_emprunts"] = fusionner_historiques(local["historique_emprunts"],
+                                                          distant["historique_emprunts"])
+    return fusion
+
+def _sans_ordre(etat):
+    return dict(etat, livres_empruntes=sorted(etat["livres_empruntes"]))
+
+class Replication:
+    """Applique à la bibliothèque locale les changements d'une bibliothèque distante"""
+
+    def __init__(self, locale, distante, nom):
+        self.locale = locale
+        self.distante = distante
+        self.nom = nom
+
+    def synchroniser(self):
+        """Tire les changements depuis la dernière synchronisation ; retourne le nombre appliqué"""
+        changements, sequence = self.distante.changements_depuis(self.locale.curseurs.get(self.nom, 0))
+        appliques = 0
+        for numero, type_, cle, etat in changements:
+            self.locale.sequence = max(self.locale.sequence, numero)
+            if type_ == "livre":
+                appliques += self._appliquer_livre(cle, etat, numero)
+            elif type_ == "utilisateur":
+                appliques += self._appliquer_utilisateur(cle, etat)
+            else:
+                appliques += self._appliquer_parametres(etat)
+        self.locale.curseurs[self.nom] = sequence
+        return appliques
+
+    def _appliquer_livre(self, isbn, distant, numero):
+        locale = self.locale
+        numero_local = locale.fil.get(("livre", isbn), 0)
+        ancien = locale.livres.get(isbn)
+
+        supprime_localement = ancien is None and numero_local
+        if supprime_localement and distant is not None and numero <= numero_local:
+            return 0
+
+        if distant is None:
+            if ancien is None or numero < numero_local:
+                return 0
+            locale.appliquer_livre(isbn, None)
+            self._deplacer_pret(isbn, ancien.emprunteur, None)
+            return 1
+
+        fusion = distant if ancien is None else fusionner_livre(ancien.to_dict(), distant)
+        if ancien is not None and fusion == ancien.to_dict():
+            if fusion != distant:
+                # L'état local l'emporte : il est republié pour que la bibliothèque distante l'adopte
+                locale.appliquer_livre(isbn, ancien)
+            return 0
+        locale.appliquer_livre(isbn, livre_depuis_dict(fusion))
+        self._deplacer_pret(isbn, ancien.emprunteur if ancien else None, fusion["emprunteur"])
+        return 1
+
+    def _deplacer_pret(self, isbn, ancien, nouveau):
+        """Garde livres_empruntes cohérent avec l'emprunteur retenu pour le livre"""
+        if ancien == nouveau:
+            return
+        if ancien in self.locale.utilisateurs:
+            user = self.locale.utilisateurs[ancien]
+            if isbn in user.livres_empruntes:
+                user.livres_empruntes.remove(isbn)
+                self.locale.appliquer_utilisateur(ancien, user)
+        if nouveau in self.locale.utilisateurs:
+            user = self.locale.utilisateurs[nouveau]
+            if isbn not in user.livres_empruntes:
+                user.livres_empruntes.append(isbn)
+                self.locale.appliquer_utilisateur(nouveau, user)
+
+    def _appliquer_utilisateur(self, id_user, distant):
+        locale = self.locale
+        ancien = locale.utilisateurs.get(id_user)
+        fusion = distant if ancien is None else fusionner_utilisateur(ancien.to_dict(), distant)
+
+        # Les prêts en cours se déduisent des livres, qui ont déjà été arbitrés
+        candidats = (ancien.livres_empruntes if ancien else []) + distant["livres_empruntes"]
+        fusion = dict(fusion, livres_empruntes=[
+            isbn for i, isbn in enumerate(candidats)
+            if isbn not in candidats[:i]
+            and isbn in locale.livres and locale.livres[isbn].emprunteur == id_user
+        ])
+
+        if ancien is not None and set(fusion["livres_empruntes"]) == set(ancien.livres_empruntes):
+            # Même prêts en cours : l'ordre local est conservé
+            fusion["livres_empruntes"] = ancien.livres_empruntes
+        if ancien is not None and fusion == ancien.to_dict():
+            if _sans_ordre(fusion) != _sans_ordre(distant):
+                locale.appliquer_utilisateur(id_user, ancien)
+            return 0
+        locale.appliquer_utilisateur(id_user, utilisateur_depuis_dict(fusion))
+        return 1
+
+    def _appliquer_parametres(self, distant):
+        if distant == self.locale.etat("parametres", None):
+            return 0
+        self.locale.modifier_parametres(distant["duree_emprunt"], distant["taux_penalite"])
+        return 1
@@ -0,0 +1,146 @@
+"""Réservations des livres empruntés.
+
+Chaque livre a sa file d'attente (premier arrivé, premier servi). Au retour,
+le livre est mis de côté pour le premier de la file, qui a quelques jours
+pour venir le chercher ; passé ce délai, il revient au suivant. Les dates
+limites sont rangées dans un tas : les mises de côté expirées se retrouvent
+sans parcourir les réservations.
+
+Toutes les opérations sur une file sont en O(1) : la file est un OrderedDict
+{id_utilisateur: date de la demande}, ce qui permet aussi d'annuler une
+réservation au milieu de la file.
+"""
+import heapq
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+class Reservations:
+    def __init__(self, max_par_utilisateur=3, delai_retrait=3):
+        self.max_par_utilisateur = max_par_utilisateur
+        # Jours laissés pour venir chercher un livre mis de côté
+        self.delai_retrait = delai_retrait
+        # isbn -> OrderedDict {id_utilisateur: date de la demande}
+        self.files = {}
+        # isbn -> (id_utilisateur, date limite de retrait)
+        self.mises_de_cote = {}
+        # id_utilisateur -> isbn réservés ou mis de côté, pour la limite par utilisateur
+        self.par_utilisateur = {}
+        # Tas des (date limite, isbn, id_utilisateur) ; une entrée qui ne correspond plus
+        # à mises_de_cote (livre retiré, réservation annulée) est ignorée quand elle sort
+        self.echeances = []
+
+    def nombre(self, id_user):
+        return len(self.par_utilisateur.get(id_user, ()))
+
+    def file(self, isbn):
+        """Utilisateurs en attente pour ce livre, dans l'ordre"""
+        return list(self.files.get(isbn, ()))
+
+    def mise_de_cote(self, isbn):
+        """(id_utilisateur, date limite) si le livre attend qu'on vienne le chercher, sinon None"""
+        return self.mises_de_cote.get(isbn)
+
+    def ajouter(self, isbn, id_user, maintenant):
+        """Place l'utilisateur en fin de file ; False au-delà de la limite ou s'il attend déjà ce livre"""
+        reserves = self.par_utilisateur.setdefault(id_user, set())
+        if isbn in reserves or len(reserves) >= self.max_par_utilisateur:
+            return False
+        reserves.add(isbn)
+        self.files.setdefault(isbn, OrderedDict())[id_user] = maintenant
+        return True
+
+    def _oublier(self, isbn, id_user):
+        reserves = self.par_utilisateur.get(id_user)
+        if reserves is not None:
+            reserves.discard(isbn)
+            if not reserves:
+                del self.par_utilisateur[id_user]
+
+    def annuler(self, isbn, id_user, maintenant):
+        """Retire une réservation ; un livre mis de côté passe au suivant. Retourne False si elle n'existait pas"""
+        mise = self.mises_de_cote.get(isbn)
+        if mise is not None and mise[0] == id_user:
+            del self.mises_de_cote[isbn]
+            self._oublier(isbn, id_user)
+            self.servir(isbn, maintenant)
+            return True
+        file = self.files.get(isbn)
+        if not file or id_user not in file:
+            return False
+        del file[id_user]
+        if not file:
+            del self.files[isbn]
+        self._oublier(isbn, id_user)
+        return True
+
+    def servir(self, isbn, maintenant):
+        """Met le livre rendu de côté pour le premier de la file ; retourne son identifiant ou None"""
+        file = self.files.get(isbn)
+        if not file:
+            return None
+        id_user, _ = file.popitem(last=False)
+        if not file:
+            del self.files[isbn]
+        limite = maintenant + timedelta(days=self.delai_retrait)
+        self.mises_de_cote[isbn] = (id_user, limite)
+        heapq.heappush(self.echeances, (limite, isbn, id_user))
+        return id_user
+
+    def reporter(self, isbn, maintenant):
+        """Le livre mis de côté est parti chez quelqu'un d'autre : son titulaire repasse en tête de file"""
+        id_user, _ = self.mises_de_cote.pop(isbn)
+        file = self.files.setdefault(isbn, OrderedDict())
+        file[id_user] = maintenant
+        file.move_to_end(id_user, last=False)
+
+    def retirer(self, isbn, id_user):
+        """Le titulaire de la mise de côté emprunte le livre"""
+        del self.mises_de_cote[isbn]
+        self._oublier(isbn, id_user)
+
+    def expirer(self, maintenant):
+        """Passe au suivant les mises de côté dont la date limite est dépassée ; retourne les isbn concernés"""
+        touches = []
+        while self.echeances and self.echeances[0][0] <= maintenant:
+            limite, isbn, id_user = heapq.heappop(self.echeances)
+            if self.mises_de_cote.get(isbn) != (id_user, limite):
+                continue
+            del self.mises_de_cote[isbn]
+            self._oublier(isbn, id_user)
+            # Le suivant a le même délai à partir de maintenant
+            self.servir(isbn, maintenant)
+            touches.append(isbn)
+        return touches
+
+    def oublier_livre(self, isbn):
+        """Supprime toutes les réservations d'un livre retiré du catalogue"""
+        for id_user in self.files.pop(isbn, ()):
+            self._oublier(isbn, id_user)
+        mise = self.mises_de_cote.pop(isbn, None)
+        if mise is not None:
+            self._oublier(isbn, mise[0])
+
+    def to_dict(self):
+        return {
+            "max_par_utilisateur": self.max_par_utilisateur,
+            "delai_retrait": self.delai_retrait,
+            "files": {isbn: [[id_user, date.isoformat()] for id_user, date in file.items()]
+                      for isbn, file in self.files.items()},
+            "mises_de_cote": {isbn: [id_user, limite.isoformat()]
+                              for isbn, (id_user, limite) in self.mises_de_cote.items()},
+        }
+
+def reservations_depuis_dict(d):
+    reservations = Reservations(d["max_par_utilisateur"], d["delai_retrait"])
+    for isbn, file in d["files"].items():
+        reservations.files[isbn] = OrderedDict(
+            (id_user, datetime.fromisoformat(date)) for id_user, date in file)
+        for id_user, _ in file:
+            reservations.par_utilisateur.setdefault(id_user, set()).add(isbn)
+    for isbn, (id_user, limite) in d["mises_de_cote"].items():
+        limite = datetime.fromisoformat(limite)
+        reservations.mises_de_cote[isbn] = (id_user, limite)
+        reservations.par_utilisateur.setdefault(id_user, set()).add(isbn)
+        reservations.echeances.append((limite, isbn, id_user))
+    heapq.heapify(reservations.echeances)
+    return reservations
@@ -0,0 +1,113 @@
+"""Surveillance de la réactivité de la boucle Tk.
+
+Un battement programmé avec root.after mesure le retard de la boucle
+d'événements : s'il arrive beaucoup plus tard que prévu, la boucle était
+bloquée. Les commandes des boutons sont enveloppées pour chronométrer chaque
+gestionnaire ; pendant qu'il s'exécute, un thread auxiliaire échantillonne la
+pile du thread principal dès que la boucle est bloquée depuis plus que le
+seuil. Les gestionnaires trop lents sont écrits dans un journal avec la pile
+la plus souvent observée, ce qui désigne la ligne fautive sans profileur.
+
+Un gestionnaire qui ouvre une boîte de dialogue n'est pas compté comme lent :
+la boucle continue de tourner pendant le dialogue et les battements arrivent.
+"""
+import functools
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+class SurveillanceBoucle:
+    def __init__(self, programmer, journal="lenteurs.log", periode=0.1, seuil=0.25, intervalle=0.02):
+        # programmer(delai_ms, fonction) : root.after
+        self.programmer = programmer
+        self.journal = journal
+        self.periode = periode
+        self.seuil = seuil
+        self.intervalle = intervalle
+        self.thread_principal = threading.get_ident()
+        self.dernier_battement = time.perf_counter()
+        # Fin du dernier gestionnaire signalé, pour ne pas signaler deux fois le même blocage
+        self.dernier_signalement = 0.0
+        self.retard_max = 0.0
+        self.lents = 0
+        # Gestionnaires en cours, le plus récent en dernier : [nom, début, pire blocage, piles]
+        self.en_cours = []
+        self.verrou = threading.Lock()
+        self.actif = threading.Event()
+        threading.Thread(target=self._echantillonner, daemon=True).start()
+        self.programmer(int(self.periode * 1000), self._battement)
+
+    def _battement(self):
+        maintenant = time.perf_counter()
+        precedent, self.dernier_battement = self.dernier_battement, maintenant
+        retard = maintenant - precedent - self.periode
+        self.retard_max = max(self.retard_max, retard)
+        # Un gestionnaire enveloppé rapporte lui-même son blocage
+        if retard > self.seuil and not self.en_cours and self.dernier_signalement < precedent:
+            self._ecrire(f"boucle Tk bloquée {retard * 1000:.0f} ms hors gestionnaire surveillé")
+        self.programmer(int(self.periode * 1000), self._battement)
+
+    def _blocage(self, debut, maintenant):
+        """Temps écoulé sans battement depuis le début du gestionnaire"""
+        return maintenant - max(debut, self.dernier_battement)
+
+    def _echantillonner(self):
+        while True:
+            self.actif.wait()
+            time.sleep(self.intervalle)
+            with self.verrou:
+                if not self.en_cours:
+                    continue
+                appel = self.en_cours[-1]
+            blocage = self._blocage(appel[1], time.perf_counter())
+            if blocage < self.seuil:
+                continue
+            cadre = sys._current_frames().get(self.thread_principal)
+            if cadre is None:
+                continue
+            pile = tuple(traceback.format_stack(cadre))
+            with self.verrou:
+                appel[2] = max(appel[2], blocage)
+                appel[3][pile] += 1
+
+    def envelopper(self, fonction, nom=None):
+        """Retourne la commande chronométrée, à passer en command= d'un bouton"""
+        nom = nom or fonction.__qualname__
+
+        @functools.wraps(fonction)
+        def commande(*args, **kwargs):
+            appel = [nom, time.perf_counter(), 0.0, Counter()]
+            with self.verrou:
+                self.en_cours.append(appel)
+            self.actif.set()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                fin = time.perf_counter()
+                with self.verrou:
+                    self.en_cours.remove(appel)
+                    if not self.en_cours:
+                        self.actif.clear()
+                blocage = max(appel[2], self._blocage(appel[1], fin))
+                if blocage > self.seuil:
+                    self.dernier_signalement = fin
+                    self._signaler(appel, blocage, fin - appel[1])
+        return commande
+
+    def _signaler(self, appel, blocage, duree):
+        nom, _, _, piles = appel
+        self.lents += 1
+        lignes = [f"{nom} : boucle Tk bloquée {blocage * 1000:.0f} ms (durée totale {duree * 1000:.0f} ms), "
+                  f"{sum(piles.values())} échantillon(s)"]
+        if piles:
+            pile, nombre = piles.most_common(1)[0]
+            lignes.append(f"pile la plus fréquente ({nombre} échantillon(s)) :")
+            lignes += [ligne.rstrip("\n") for ligne in pile]
+        self._ecrire("\n".join(lignes))
+
+    def _ecrire(self, texte):
+        with open(self.journal, "a", encoding="utf-8") as f:
+            f.write(f"[{datetime.now().isoformat(timespec='seconds')}] {texte}\n")